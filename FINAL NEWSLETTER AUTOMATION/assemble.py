@@ -0,0 +1,127 @@
+import os
+import re
+
+from templating import MODULES_END, MODULES_START
+
+# Final template assembly for runner.py: the header, approved sections and
+# footer are streamed to disk one chunk at a time, optionally minified, and the
+# output size is checked against Gmail's clipping limit.
+
+# Gmail clips messages whose HTML is larger than ~102 KB
+GMAIL_CLIP_BYTES = 102 * 1024
+
+# Whitespace next to these tags is layout-insignificant and can be dropped
+BLOCK_TAGS = {
+    "!doctype", "html", "head", "body", "meta", "title", "style", "link", "table", "thead", "tbody",
+    "tfoot", "tr", "td", "th", "div", "p", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li",
+    "br", "center", "multi", "single", "modules", "module", "buttons", "repeatable",
+}
+
+# Blocks that are copied through verbatim (apart from <style> minification)
+PROTECTED_RE = re.compile(
+    r"<!--\[if.*?<!\[endif\]-->|<!--.*?-->|<(style|pre|textarea)\b[^>]*>.*?</\1\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+STYLE_BLOCK_RE = re.compile(r"(<style\b[^>]*>)(.*?)(</style\s*>)", re.IGNORECASE | re.DOTALL)
+STYLE_ATTR_RE = re.compile(r'(\sstyle=")([^"]*)(")', re.IGNORECASE)
+TAG_RE = re.compile(r"(<[^>]+>)")
+TAG_NAME_RE = re.compile(r"</?\s*([!\w:-]+)")
+WS_RE = re.compile(r"\s+")
+
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = WS_RE.sub(" ", css)
+    # Spaces before ':' are kept, they are significant in selectors (".a :hover")
+    css = re.sub(r"\s*([;{},>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+def minify_style_attr(match):
+    return match.group(1) + minify_css(match.group(2)).rstrip(";") + match.group(3)
+
+def tag_name(tag):
+    match = TAG_NAME_RE.match(tag)
+    return match.group(1).lower() if match else ""
+
+def minify_html(html):
+    protected = []
+
+    def protect(match):
+        block = match.group(0)
+        if block.startswith("<!--") and not block.startswith("<!--[if"):
+            return ""  # plain comments are dropped
+        if block[:6].lower() == "<style":
+            block = STYLE_BLOCK_RE.sub(lambda m: m.group(1) + minify_css(m.group(2)) + m.group(3), block)
+        protected.append(block)
+        return f"<\x00{len(protected) - 1}>"
+
+    html = PROTECTED_RE.sub(protect, html)
+    html = STYLE_ATTR_RE.sub(minify_style_attr, html)
+
+    tokens = TAG_RE.split(html)
+    out = []
+    for i, token in enumerate(tokens):
+        if i % 2 == 1:  # tag
+            out.append(token)
+            continue
+        if not token:
+            continue
+        if token.strip():
+            out.append(WS_RE.sub(" ", token))
+            continue
+        # Whitespace-only text between two tags: drop it next to block tags
+        prev_tag = tokens[i - 1] if i > 0 else ""
+        next_tag = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if (not prev_tag or not next_tag or "\x00" in prev_tag or "\x00" in next_tag
+                or tag_name(prev_tag) in BLOCK_TAGS or tag_name(next_tag) in BLOCK_TAGS):
+            continue
+        out.append(" ")
+
+    html = "".join(out)
+    return re.sub(r"<\x00(\d+)>", lambda m: protected[int(m.group(1))], html)
+
+def write_template(path, header, parts, footer, minify=False, markers=True):
+    # Stream each chunk straight to a temp file, then swap it into place.
+    # Returns the number of bytes written.
+    tmp_path = path + ".tmp"
+    size = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # The markers stay (unminified) so verify.py can crop the modules region
+        start, end = (MODULES_START + "\n", MODULES_END + "\n") if markers else ("", "")
+        chunks = [header, start]
+        for part in parts:
+            chunks.append(part)
+            chunks.append("\n")
+        chunks.append(end)
+        chunks.append(footer)
+        for chunk in chunks:
+            if minify and chunk not in (start, end):
+                chunk = minify_html(chunk)
+            f.write(chunk)
+            size += len(chunk.encode("utf-8"))
+    os.replace(tmp_path, path)
+    return size
+
+def size_report(size):
+    percent = size * 100 / GMAIL_CLIP_BYTES
+    line = f"[SYSTEM] Output size: {size / 1024:.1f} KB ({percent:.0f}% of Gmail's {GMAIL_CLIP_BYTES // 1024} KB clipping limit)."
+    if size > GMAIL_CLIP_BYTES:
+        line += "\n[WARNING] Gmail will clip this newsletter. Try --minify or remove sections before sending."
+    return line
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Minify a Mailster template and check it against Gmail's clipping limit.")
+    parser.add_argument("--input", type=str, required=True, help="HTML template to check")
+    parser.add_argument("--output", type=str, help="Write the minified template here")
+    args = parser.parse_args()
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        source = f.read()
+    print(f"[SYSTEM] {args.input}")
+    print(size_report(len(source.encode("utf-8"))))
+    if args.output:
+        print(f"[SYSTEM] {args.output} (minified)")
+        print(size_report(write_template(args.output, source, [], "", minify=True, markers=False)))
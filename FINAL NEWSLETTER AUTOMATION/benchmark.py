@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+import json
+import argparse
+import time
+
+import worker
+from verify import iou_matrix
+
+def time_call(fn, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def count_sections(boxes):
+    # Same minimum section size as worker.analyze_image
+    return sum(1 for _, _, w, h in boxes if w > 100 and h > 50)
+
+def compare_segmenters(filepath, expected=None, repeat=5, pyramid=1):
+    img = cv2.imread(filepath)
+    if img is None:
+        return {"error": f"Could not open or find the image {filepath}"}
+
+    report = {"input": filepath, "pyramid": pyramid, "expected_sections": expected, "segmenters": {}}
+    for name in worker.SEGMENTERS:
+        best, boxes = time_call(lambda: worker.find_sections(img, pyramid, name), repeat)
+        found = count_sections(boxes)
+        entry = {"best_ms": round(best * 1000, 2), "sections": found}
+        if expected is not None:
+            entry["count_error"] = found - expected
+        report["segmenters"][name] = entry
+    return report
+
+def match_count(truth, found, threshold=0.5, types=None):
+    # Greedy one-to-one matches with IoU >= threshold (and equal type if given)
+    ious = iou_matrix(truth, found)
+    if not ious.size:
+        return 0
+    if types is not None:
+        types_t, types_f = np.array(types[0]), np.array(types[1])
+        ious = np.where(types_t[:, None] == types_f[None, :], ious, 0.0)
+    used_t, used_f = set(), set()
+    for flat in np.argsort(ious, axis=None)[::-1]:
+        i, j = np.unravel_index(flat, ious.shape)
+        if ious[i, j] < threshold:
+            break
+        if i not in used_t and j not in used_f:
+            used_t.add(i)
+            used_f.add(j)
+    return len(used_t)
+
+def precision_recall(n_truth, n_found, matched):
+    return {
+        "truth": n_truth,
+        "found": n_found,
+        "matched": matched,
+        "precision": round(matched / n_found, 3) if n_found else None,
+        "recall": round(matched / n_truth, 3) if n_truth else None,
+    }
+
+def box(d):
+    return [d["x"], d["y"], d["width"], d["height"]]
+
+def evaluate(filepath, truth_path, repeat=5, pyramid=1, segmenter="contour", threshold=0.5):
+    # Per-stage timings of the full analysis (median over runs) and box
+    # precision/recall against the ground truth written by synth_skeleton.py
+    with open(truth_path, "r") as f:
+        truth = json.load(f)
+
+    runs = []
+    result = None
+    for _ in range(repeat):
+        timings = {}
+        result = worker.analyze_image(filepath, pyramid, segmenter, timings=timings)
+        runs.append(timings)
+    if "error" in result:
+        return result
+    stages = {name: round(float(np.median([t.get(name, 0.0) for t in runs])) * 1000, 2) for name in runs[0]}
+    stages["total"] = round(sum(stages.values()), 2)
+
+    truth_elements = [e for s in truth["sections"] for e in s["elements"]]
+    found_elements = [e for s in result["sections"] for e in s["elements"]]
+    sections_matched = match_count([box(s) for s in truth["sections"]], [box(s) for s in result["sections"]], threshold)
+    elements_matched = match_count([box(e) for e in truth_elements], [box(e) for e in found_elements], threshold,
+                                   ([e["type"] for e in truth_elements], [e["type"] for e in found_elements]))
+    return {
+        "input": filepath,
+        "truth": truth_path,
+        "segmenter": segmenter,
+        "pyramid": pyramid,
+        "stages_ms": stages,
+        "sections": precision_recall(len(truth["sections"]), len(result["sections"]), sections_matched),
+        "elements": precision_recall(len(truth_elements), len(found_elements), elements_matched),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the section segmenters of worker.py.")
+    parser.add_argument("--input", type=str, nargs="+", default=["Skeleton.png"], help="Skeleton image(s) to benchmark")
+    parser.add_argument("--expected", type=int, nargs="*", help="Known section count for each input, in the same order")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per segmenter; the best time is reported")
+    parser.add_argument("--pyramid", type=int, default=1, help="Downscale factor passed to worker.find_sections")
+    parser.add_argument("--truth", type=str, nargs="*",
+                        help="Ground-truth JSON for each input (see synth_skeleton.py); adds stage timings and precision/recall")
+    parser.add_argument("--segmenter", choices=worker.SEGMENTERS, default="contour", help="Segmenter used with --truth")
+    parser.add_argument("--iou", type=float, default=0.5, help="Minimum IoU for a detected box to count as a match")
+
+    args = parser.parse_args()
+
+    expected = args.expected or []
+    truth = args.truth or []
+    results = []
+    for i, path in enumerate(args.input):
+        if i < len(truth):
+            results.append(evaluate(path, truth[i], args.repeat, args.pyramid, args.segmenter, args.iou))
+        else:
+            results.append(compare_segmenters(path, expected[i] if i < len(expected) else None, args.repeat, args.pyramid))
+    print(json.dumps({"results": results}, indent=2))
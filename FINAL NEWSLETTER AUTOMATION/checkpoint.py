@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import tempfile
+
+# Per-skeleton session checkpoints for runner.py. A checkpoint is keyed by the
+# SHA-256 of the skeleton image and rewritten atomically after every decision,
+# so a crashed or closed session resumes at the first undecided section.
+
+CHECKPOINT_DIR = ".checkpoints"
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+image_hash = file_hash
+
+def geometry(sec):
+    return [sec["x"], sec["y"], sec["width"], sec["height"]]
+
+class Checkpoint:
+    def __init__(self, image_path, directory=CHECKPOINT_DIR):
+        self.image_path = image_path
+        self.image_hash = image_hash(image_path)
+        self.path = os.path.join(directory, f"{self.image_hash}.json")
+        self.data = {"image": image_path, "image_hash": self.image_hash, "blueprint": None, "sections": {}}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                self.data = json.load(f)
+
+    @property
+    def blueprint(self):
+        return self.data.get("blueprint")
+
+    def save(self):
+        # Write to a temp file in the same directory, then atomically replace
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def set_blueprint(self, sections):
+        self.data["blueprint"] = sections
+        self.save()
+
+    def _entry(self, idx):
+        return self.data["sections"].setdefault(str(idx + 1), {})
+
+    def decision(self, idx, sec):
+        # (status, html) for a section decided earlier with the same geometry
+        entry = self.data["sections"].get(str(idx + 1), {})
+        if entry.get("status") and entry.get("geometry") == geometry(sec):
+            return entry["status"], entry.get("html")
+        return None
+
+    def record(self, idx, sec, status, html=None):
+        entry = self._entry(idx)
+        entry.update({"status": status, "html": html, "geometry": geometry(sec)})
+        self.save()
+
+    def needs_crop(self, idx, sec, crop_path):
+        # section_N.png is shared by every skeleton cropped in the same
+        # directory, so the file must also be the one this session wrote
+        cropped = self.data["sections"].get(str(idx + 1), {}).get("cropped")
+        if not os.path.exists(crop_path) or not isinstance(cropped, dict):
+            return True
+        return cropped.get("geometry") != geometry(sec) or cropped.get("sha256") != file_hash(crop_path)
+
+    def mark_cropped(self, idx, sec, crop_path):
+        if not os.path.exists(crop_path):
+            return  # the crop failed; it stays stale
+        self._entry(idx)["cropped"] = {"geometry": geometry(sec), "sha256": file_hash(crop_path)}
+        self.save()
+
+    def first_pending(self, sections):
+        for idx, sec in enumerate(sections):
+            if self.decision(idx, sec) is None:
+                return idx
+        return len(sections)
@@ -0,0 +1,122 @@
+from snippets import SCALE
+from worker import layout_tree, sweep_groups
+
+# Deterministic Mailster HTML for the simple layouts the runner sees every
+# month. generate_section() returns None for anything it does not recognise so
+# the runner can fall back to the interactive HITL loop.
+
+CONTENT_WIDTH = 552
+GUTTER = 24
+BG = "#ffffff"
+
+def px(value):
+    return int(round(value * SCALE))
+
+def cell_style():
+    return f'style="background-color: {BG};" bgcolor="{BG}"'
+
+def spacer(height, colspan=None):
+    span = f' colspan="{colspan}"' if colspan else ""
+    return f'<tr><td height="{height}"{span} {cell_style()}></td></tr>'
+
+def image_html(width, height, alt):
+    return (f'<img src="https://dummy.mailster.co/{width}x{height}.jpg" width="{width}" '
+            f'height="auto" editable="" alt="{alt}" class="">')
+
+def text_html(index, headline):
+    if headline:
+        return f'<single label="Headline {index}"><h3>Headline</h3></single>'
+    return f'<multi label="Text {index}"><p>Body text goes here.</p></multi>'
+
+def button_html(width, align):
+    return (f'<table class="textbutton" align="{align}" role="presentation"><tbody><tr>'
+            f'<td align="center" width="{width}" style="background-color: #fecf07;">'
+            f'<a href="#" editable="" label="Button">Read More</a>'
+            f'</td></tr></tbody></table>')
+
+def alignment(element, section):
+    # Centered if the element's midpoint sits near the section's midpoint
+    mid = element["x"] + element["width"] / 2
+    section_mid = section["x"] + section["width"] / 2
+    return "center" if abs(mid - section_mid) < section["width"] * 0.1 else "left"
+
+def stack_rows(elements, section, width):
+    # One <tr> per element with the 8px element separator between them
+    rows = []
+    texts = [e for e in elements if e["type"] == "text"]
+    for i, e in enumerate(elements):
+        align = alignment(e, section) if width == CONTENT_WIDTH else "left"
+        if e["type"] == "image":
+            inner = image_html(min(px(e["width"]), width), px(e["height"]), f"Image {i+1}")
+        elif e["type"] == "button":
+            inner = button_html(min(px(e["width"]), width), align)
+        else:
+            inner = text_html(i + 1, headline=len(texts) > 1 and e is texts[0])
+        if rows:
+            rows.append(spacer(8))
+        rows.append(f'<tr><td align="{align}" {cell_style()}>{inner}</td></tr>')
+    return rows
+
+def module(inner):
+    # Standard 24 | 552 | 24 section row preceded by the 24px module separator
+    return "\n".join([
+        spacer(24, colspan=3),
+        "<tr>",
+        f'<td width="{GUTTER}" class="padd" {cell_style()}>&zwnj;</td>',
+        f'<td width="{CONTENT_WIDTH}" valign="top" align="center" {cell_style()}>',
+        inner,
+        "</td>",
+        f'<td width="{GUTTER}" class="padd" {cell_style()}>&zwnj;</td>',
+        "</tr>",
+    ])
+
+def stacked_table(rows):
+    return "\n".join([f'<table cellpadding="0" cellspacing="0" role="presentation" width="100%" {cell_style()}>', "<tbody>", *rows, "</tbody>", "</table>"])
+
+def single_image(section, image):
+    width = min(px(image["width"]), CONTENT_WIDTH)
+    return module(image_html(width, px(image["height"]), "Section Image"))
+
+def text_stack(section, elements):
+    return module(stacked_table(stack_rows(elements, section, CONTENT_WIDTH)))
+
+def two_column(section, left, right):
+    image_side = left if left[0]["type"] == "image" else right
+    image_width = min(px(image_side[0]["width"]), CONTENT_WIDTH - GUTTER - 120)
+    text_width = CONTENT_WIDTH - GUTTER - image_width
+    columns = []
+    for column in (left, right):
+        width = image_width if column is image_side else text_width
+        columns.append(f'<td width="{width}" valign="top" {cell_style()}>{stacked_table(stack_rows(column, section, width))}</td>')
+    row = f'<tr>{columns[0]}<td width="{GUTTER}" {cell_style()}>&zwnj;</td>{columns[1]}</tr>'
+    return module("\n".join([f'<table cellpadding="0" cellspacing="0" class="o-fix" role="presentation" width="100%" {cell_style()}>', "<tbody>", row, "</tbody>", "</table>"]))
+
+def generate_section(section):
+    by_id = {e["id"]: e for e in section.get("elements", [])}
+    # Blueprints from older checkpoints have no layout tree yet
+    layout = section.get("layout") or layout_tree(section.get("elements", []))
+    rows = [[[by_id[i] for i in column["elements"]] for column in row["columns"]] for row in layout["rows"]]
+    elements = [e for row in rows for column in row for e in column]
+    types = [e["type"] for e in elements]
+
+    # Nothing detected is a detection miss, not an image: leave it to review
+    if not elements:
+        return None
+    if types == ["image"]:
+        return single_image(section, elements[0])
+
+    # Text (+ button) stacked in a single column
+    if "image" not in types and all(len(row) == 1 and len(row[0]) == 1 for row in rows):
+        return text_stack(section, elements)
+
+    # Two columns: one image on one side, text/buttons stacked on the other.
+    # Columns of every row are banded by x, so a button below the text still
+    # belongs to the text column.
+    bands = sweep_groups([c for row in layout["rows"] for c in row["columns"]], "x", "width")
+    if len(bands) == 2 and all(len(row) <= 2 for row in rows):
+        left, right = (sorted((by_id[i] for c in band for i in c["elements"]), key=lambda e: e["y"]) for band in bands)
+        for image_col, text_col in ((left, right), (right, left)):
+            if [e["type"] for e in image_col] == ["image"] and all(e["type"] != "image" for e in text_col):
+                return two_column(section, left, right)
+
+    return None
@@ -0,0 +1,172 @@
+import cv2
+import numpy as np
+import json
+import argparse
+import os
+
+import worker
+
+# Perceptual-hash index of previously approved skeleton sections. Every entry
+# keeps the section's pHash/dHash and its approved HTML; lookups go through a
+# BK-tree on pHash Hamming distance, so matching a new crop costs O(log n).
+
+SECTION_INDEX = "section_index.json"
+MAX_DISTANCE = 6  # bits out of 64
+# Crops flatter than this (grey-level std) hash to the same few values
+# whatever they show, e.g. every plain placeholder box, so they are neither
+# indexed nor looked up
+FLAT_STD = 2.0
+MAX_COLOR_DIFF = 12  # per BGR channel, between mean colours
+
+def _dct_matrix(n):
+    k = np.arange(n)
+    m = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+DCT_32 = _dct_matrix(32)
+
+def _to_gray(img):
+    return img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+def _bits_to_int(bits):
+    return int("".join("1" if b else "0" for b in bits.ravel()), 2)
+
+def dhash(img):
+    small = cv2.resize(_to_gray(img), (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+def phash(img):
+    small = cv2.resize(_to_gray(img), (32, 32), interpolation=cv2.INTER_AREA).astype(np.float64)
+    low = (DCT_32 @ small @ DCT_32.T)[:8, :8]
+    # Median of the low frequencies without the DC term
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+def is_flat(img):
+    return float(cv2.meanStdDev(_to_gray(img))[1][0, 0]) < FLAT_STD
+
+def mean_color(img):
+    return [round(c, 1) for c in cv2.mean(img)[:3]]
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+class BKTree:
+    def __init__(self):
+        self.root = None  # [key, value, {distance: child}]
+
+    def add(self, key, value):
+        if self.root is None:
+            self.root = [key, value, {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(key, node[0])
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [key, value, {}]
+                return
+            node = child
+
+    def search(self, key, max_distance):
+        # (distance, value) pairs within max_distance, closest first
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = hamming(key, node[0])
+            if d <= max_distance:
+                found.append((d, node[1]))
+            for child_d, child in node[2].items():
+                if d - max_distance <= child_d <= d + max_distance:
+                    stack.append(child)
+        found.sort(key=lambda f: f[0])
+        return found
+
+class SectionIndex:
+    def __init__(self, path=SECTION_INDEX):
+        self.path = path
+        self.entries = []
+        self.tree = BKTree()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for entry in json.load(f):
+                    self._insert(entry)
+
+    def _insert(self, entry):
+        self.entries.append(entry)
+        self.tree.add(int(entry["phash"], 16), len(self.entries) - 1)
+
+    def add(self, crop, html, source=None):
+        # Returns the entry, or None for a flat crop that cannot be told apart from others
+        if is_flat(crop):
+            return None
+        key = phash(crop)
+        for _, i in self.tree.search(key, 0):
+            if self.entries[i]["html"] == html and self.entries[i]["dhash"] == f"{dhash(crop):016x}":
+                return self.entries[i]  # already indexed
+        entry = {
+            "phash": f"{key:016x}",
+            "dhash": f"{dhash(crop):016x}",
+            "width": int(crop.shape[1]),
+            "height": int(crop.shape[0]),
+            "mean": mean_color(crop),
+            "html": html,
+            "source": source,
+        }
+        self._insert(entry)
+        return entry
+
+    def lookup(self, crop, max_distance=MAX_DISTANCE):
+        if is_flat(crop):
+            return None
+        h, w = crop.shape[:2]
+        color = mean_color(crop)
+        for distance, i in self.tree.search(phash(crop), max_distance):
+            entry = self.entries[i]
+            # Hashes ignore aspect ratio, so check the crop shape as well
+            if abs(entry["width"] / entry["height"] - w / h) > 0.1 * (w / h):
+                continue
+            # Hashes ignore colour; entries from before "mean" was stored skip this check
+            if "mean" in entry and max(abs(a - b) for a, b in zip(entry["mean"], color)) > MAX_COLOR_DIFF:
+                continue
+            # dHash as a second, gradient-based opinion
+            if hamming(int(entry["dhash"], 16), dhash(crop)) > 2 * max_distance:
+                continue
+            return dict(entry, distance=distance)
+        return None
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+def section_crops(img, sections):
+    # Zero-copy views of each section in the decoded skeleton
+    return [img[s["y"]:s["y"]+s["height"], s["x"]:s["x"]+s["width"]] for s in sections]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match skeleton sections against previously approved ones.")
+    parser.add_argument("--input", type=str, required=True, help="Skeleton image")
+    parser.add_argument("--index", type=str, default=SECTION_INDEX, help="Section index file")
+    parser.add_argument("--max-distance", type=int, default=MAX_DISTANCE, help="Maximum pHash Hamming distance")
+
+    args = parser.parse_args()
+
+    img = worker.load_image(args.input)
+    if img is None:
+        print(json.dumps({"error": f"Could not open or find the image {args.input}"}))
+        exit(1)
+
+    # Section bands only; no element analysis is needed to recognise a section
+    boxes = [b for b in worker.find_sections(img) if b[2] > 100 and b[3] > 50]
+    boxes.sort(key=lambda b: b[1])
+    index = SectionIndex(args.index)
+    matches = []
+    for i, (x, y, w, h) in enumerate(boxes):
+        entry = index.lookup(img[y:y+h, x:x+w], args.max_distance)
+        matches.append({"section": f"section_{i+1}", "known": entry is not None,
+                        "distance": entry["distance"] if entry else None,
+                        "source": entry["source"] if entry else None})
+    print(json.dumps({"indexed": len(index.entries), "sections": matches}, indent=2))
@@ -0,0 +1,194 @@
+import importlib
+import json
+import os
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import fastpath
+import snippets
+
+# Pipelined mode for runner.py: every section is cropped and turned into a
+# generation request up front, candidates are produced concurrently by a
+# generator callback, and the human reviews them from a queue in section order.
+
+MAILSTER_RULES = [
+    "- **MANDATORY: All images MUST have `height=\"auto\"`** - Never use fixed heights",
+    "- **MANDATORY: All image placeholders MUST use the format**: `https://dummy.mailster.co/WIDTHxHEIGHT.jpg`",
+    "- **MANDATORY: CSS Resets** - All templates MUST include `margin: 0 !important;` for `h1-h6` and `p/li` tags to prevent browser interference.",
+    "- **Simple buttons** - Direct `<table class=\"textbutton\">` without complex wrappers",
+]
+
+# Failed generations of one section that are retried in the background before
+# the reviewer is asked whether to keep trying
+GENERATOR_ATTEMPTS = 3
+
+def stub_generator(request):
+    # Local generator for tests and dry runs: rule-based HTML where possible,
+    # otherwise a section-sized placeholder image.
+    section = request["section"]
+    html = fastpath.generate_section(section)
+    if html is None:
+        html = fastpath.single_image(section, section)
+    return html
+
+def load_generator(spec):
+    # "module:function", e.g. "pipeline:stub_generator" or "my_agent:generate"
+    module_name, _, func_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), func_name or "generate")
+
+def crop_all(image_path, output_dir=".", only=None):
+    # only: 0-based indices of the crops to (re)write; the rest are left alone
+    cmd = ["python", "worker.py", "--crop-all", "--input", image_path, "--outdir", output_dir]
+    if only is not None:
+        cmd += ["--only", *(str(idx + 1) for idx in only)]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        return json.loads(result.stdout).get("files", [])
+    except Exception:
+        print(f"Error parsing worker output. Raw output:\n{result.stdout}")
+        return []
+
+def build_request(idx, sec, crop_path, feedback=None):
+    return {
+        "section_index": idx + 1,
+        "section": sec,
+        "crop": crop_path,
+        "rules": MAILSTER_RULES,
+        "feedback": feedback,
+    }
+
+def show(title, html):
+    print(f"\n{title}")
+    print("-" * 50)
+    print(html)
+    print("-" * 50)
+
+def run_pipelined(image_path, sections, generator, snippet_cache, fastpath_mode="auto", workers=4, on_approve=None,
+                  checkpoint=None, known=None):
+    # With a checkpoint, sections decided in an earlier session are restored
+    # and the crops are only redone if a section's geometry changed.
+    done = {}
+    if checkpoint is not None:
+        for idx, sec in enumerate(sections):
+            prior = checkpoint.decision(idx, sec)
+            if prior is not None:
+                done[idx] = prior
+
+    def decide(idx, sec, status, html=None):
+        if checkpoint is not None:
+            checkpoint.record(idx, sec, status, html)
+
+    crops = [f"section_{idx+1}.png" for idx in range(len(sections))]
+    stale = [idx for idx in range(len(sections)) if idx not in done and
+             (checkpoint is None or checkpoint.needs_crop(idx, sections[idx], crops[idx]))]
+    if stale:
+        crops = crop_all(image_path, only=stale) or crops
+        if checkpoint is not None:
+            for idx in stale:
+                checkpoint.mark_cropped(idx, sections[idx], crops[idx])
+        print(f"[SYSTEM] Cropped {len(stale)} sections. Preparing generation requests...")
+
+    # Candidate for each section: (source, payload), where source is
+    # "checkpoint" | "known" | "cache" | "fastpath" | "generator"
+    candidates = []
+    feedbacks = {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(idx, feedback=None):
+            feedbacks[idx] = feedback
+            crop_path = crops[idx] if idx < len(crops) else os.path.join(".", f"section_{idx+1}.png")
+            return executor.submit(generator, build_request(idx, sections[idx], crop_path, feedback))
+
+        for idx, sec in enumerate(sections):
+            if idx in done:
+                candidates.append(("checkpoint", done[idx]))
+                continue
+            cached_html = snippets.lookup(snippet_cache, sec)
+            rule_html = fastpath.generate_section(sec) if fastpath_mode != "off" else None
+            if known and idx in known:
+                source, html = "known", known[idx]
+            elif cached_html is not None:
+                source, html = "cache", cached_html
+            elif rule_html is not None:
+                source, html = "fastpath", rule_html
+            else:
+                candidates.append(("generator", submit(idx)))
+                continue
+            candidates.append((source, html))
+
+        # Sections come off the queue in order; one whose generation failed
+        # is regenerated in the background and goes back to the end
+        approved = {}
+        queue = deque(range(len(sections)))
+        while queue:
+            idx = queue.popleft()
+            sec = sections[idx]
+            source, candidate = candidates[idx]
+            print(f"\n" + "="*40)
+            print(f" REVIEW QUEUE {idx+1}/{len(sections)} ({source})")
+            print(f" ID: {sec['id']}, Width: {sec['width']}, Height: {sec['height']}")
+            print("="*40)
+
+            if source == "checkpoint":
+                status, html = candidate
+                if status == "approved":
+                    approved[idx] = html
+                print(f"[SYSTEM] Section {idx+1} {status} earlier. Restored from checkpoint.")
+                continue
+
+            if source == "fastpath" and fastpath_mode == "auto":
+                approved[idx] = candidate
+                decide(idx, sec, "approved", candidate)
+                print(f"[SYSTEM] Section {idx+1} generated by the rule-based fast path.")
+                continue
+
+            if source in ("known", "cache", "fastpath"):
+                show({"known": "[KNOWN SECTION]", "cache": "[CACHE HIT]", "fastpath": "[FAST PATH]"}[source], candidate)
+                choice = input(f"[HUMAN] Use this HTML for section {idx+1}? (y = use, n = generate new): ").strip().lower()
+                if choice == 'y' or choice == 'yes':
+                    approved[idx] = candidate
+                    decide(idx, sec, "approved", candidate)
+                    print(f"[SYSTEM] Section {idx+1} approved and saved.")
+                    continue
+                print(f"[SYSTEM] Generating section {idx+1}...")
+                source, candidate = "generator", submit(idx)
+
+            while True:
+                try:
+                    generated_html = candidate.result()
+                except Exception as e:
+                    failures[idx] = failures.get(idx, 0) + 1
+                    print(f"[SYSTEM] Generating section {idx+1} failed: {e!r}")
+                    if failures[idx] < GENERATOR_ATTEMPTS:
+                        candidates[idx] = ("generator", submit(idx, feedbacks.get(idx)))
+                        queue.append(idx)
+                        print(f"[SYSTEM] Regenerating section {idx+1}; it is back at the end of the review queue.")
+                        break
+                    choice = input(f"[HUMAN] Generation failed {failures[idx]} times. Try again? (y = retry, s = skip): ").strip().lower()
+                    if choice == 's' or choice == 'skip':
+                        decide(idx, sec, "skipped")
+                        print(f"[SYSTEM] Section {idx+1} skipped.")
+                        break
+                    candidate = submit(idx, feedbacks.get(idx))
+                    continue
+                show("[HITL REVIEW]", generated_html)
+                choice = input(f"[HUMAN] Approve this HTML for section {idx+1}? (y = approve, n = retry, s = skip): ").strip().lower()
+
+                if choice == 'y' or choice == 'yes':
+                    approved[idx] = generated_html
+                    decide(idx, sec, "approved", generated_html)
+                    if on_approve is not None:
+                        on_approve(idx, sec, generated_html)
+                    print(f"[SYSTEM] Section {idx+1} approved and saved.")
+                    break
+                elif choice == 's' or choice == 'skip':
+                    decide(idx, sec, "skipped")
+                    print(f"[SYSTEM] Section {idx+1} skipped.")
+                    break
+                else:
+                    feedback = input("[HUMAN] What should change? ").strip()
+                    print(f"[SYSTEM] Regenerating section {idx+1}...")
+                    candidate = submit(idx, feedback or None)
+
+    return [approved[idx] for idx in sorted(approved)]
@@ -2,6 +2,16 @@ import subprocess
 import json
 import sys
 import os
+import argparse
+
+import snippets
+import fastpath
+import pipeline
+import assemble
+import templating
+import worker
+from phash_index import SectionIndex, section_crops
+from checkpoint import Checkpoint
 
 def get_sections(image_path):
     print(f"Running worker.py on {image_path}...")
@@ -13,221 +23,209 @@ def get_sections(image_path):
         return None
 
 def main():
+    parser = argparse.ArgumentParser(description="Interactive Mailster generation loop.")
+    parser.add_argument("--input", type=str, default="Skeleton.png", help="Skeleton image to convert")
+    parser.add_argument("--fastpath", choices=["auto", "review", "off"], default="auto",
+                        help="Rule-based HTML for simple sections: accept directly, show for approval, or disable")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Crop and generate every section concurrently, then review them from a queue in order")
+    parser.add_argument("--generator", type=str, default="pipeline:stub_generator",
+                        help="Generator callback for --pipeline as module:function")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent generator calls in --pipeline mode")
+    parser.add_argument("--fresh", action="store_true", help="Ignore this skeleton's checkpoint and start the session over")
+    parser.add_argument("--minify", action="store_true", help="Minify whitespace and CSS in mailster_template.html")
+    parser.add_argument("--template", type=str, default=templating.DEFAULT_TEMPLATE,
+                        help="Boilerplate HTML with <!-- MODULES START/END --> markers around the modules")
+    parser.add_argument("--variants", type=str,
+                        help="JSON list of placeholder values (lang, subject, preheader, ...) to render one edition each")
+    args = parser.parse_args()
+    
     print("====================================")
     print(" Vision Agent CLI Pipeline Started")
     print("====================================")
     
-    image_path = "Skeleton.png"
+    image_path = args.input
     if not os.path.exists(image_path):
          print(f"Error: {image_path} not found.")
          return
+    
+    # The boilerplate is compiled once and rendered per edition at the end
+    header, footer = templating.load_boilerplate(args.template)
          
-    data = get_sections(image_path)
+    # Approvals are checkpointed per skeleton so an interrupted session resumes
+    session = Checkpoint(image_path)
+    if args.fresh and os.path.exists(session.path):
+        os.remove(session.path)
+        session = Checkpoint(image_path)
     
-    if not data or "sections" not in data:
-        print("Could not find sections. Exiting.")
-        return
+    if session.blueprint is not None:
+        print(f"Resuming session from {session.path}")
+        sections = session.blueprint
+    else:
+        data = get_sections(image_path)
         
-    sections = data["sections"]
+        if not data or "sections" not in data:
+            print("Could not find sections. Exiting.")
+            return
+            
+        sections = data["sections"]
+        session.set_blueprint(sections)
     print(f"Detected {len(sections)} layout elements.")
+    resume_at = session.first_pending(sections)
+    if 0 < resume_at < len(sections):
+        print(f"[SYSTEM] {resume_at} sections already decided. Resuming at section {resume_at+1}.")
     
     final_html_parts = []
+    snippet_cache = snippets.load_cache()
     
-    for idx, sec in enumerate(sections):
-        # We will group all into sections for simplicity, or step by step
-        print(f"\n" + "="*40)
-        print(f" PROCESSING SECTION {idx+1}/{len(sections)}")
-        print(f" ID: {sec['id']}, Width: {sec['width']}, Height: {sec['height']}")
-        print(f" Elements found: {len(sec.get('elements', []))}")
-        print("="*40)
+    # Sections seen in earlier skeletons are recognised by perceptual hash
+    section_index = SectionIndex()
+    crops = section_crops(worker.load_image(image_path), sections)
+    known = {}
+    for idx, crop in enumerate(crops):
+        entry = section_index.lookup(crop)
+        if entry is not None:
+            known[idx] = entry["html"]
+    if known:
+        print(f"[SYSTEM] {len(known)} sections match previously approved sections.")
+    
+    def remember(idx, sec, html):
+        snippets.store(snippet_cache, sec, html)
+        snippets.save_cache(snippet_cache)
+        section_index.add(crops[idx], html, source=f"{image_path}#section_{idx+1}")
+        section_index.save()
+    
+    if args.pipeline:
+        generator = pipeline.load_generator(args.generator)
+        final_html_parts = pipeline.run_pipelined(image_path, sections, generator, snippet_cache,
+                                                  args.fastpath, args.workers, on_approve=remember,
+                                                  checkpoint=session, known=known)
+    else:
+        for idx, sec in enumerate(sections):
+            # We will group all into sections for simplicity, or step by step
+            print(f"\n" + "="*40)
+            print(f" PROCESSING SECTION {idx+1}/{len(sections)}")
+            print(f" ID: {sec['id']}, Width: {sec['width']}, Height: {sec['height']}")
+            print(f" Elements found: {len(sec.get('elements', []))}")
+            print("="*40)
         
-        # Optional: crop the section so the agent can see it directly
-        subprocess.run(["python", "worker.py", "--crop", "--input", image_path, "--section", str(idx+1)])
-        print(f"\n[SYSTEM] Agent, please look at 'section_{idx+1}.png' and context above.")
+            prior = session.decision(idx, sec)
+            if prior is not None:
+                status, html = prior
+                if status == "approved":
+                    final_html_parts.append(html)
+                print(f"[SYSTEM] Section {idx+1} {status} earlier. Restored from checkpoint.")
+                continue
         
-        while True:
-            print(f"[SYSTEM] Agent, generate the Mailster HTML for Section {idx+1}.")
-            print("Type your HTML code below. When done, type 'EOF' on a new line to submit.")
-            print("- **MANDATORY: All images MUST have `height=\"auto\"`** - Never use fixed heights")
-            print("- **MANDATORY: All image placeholders MUST use the format**: `https://dummy.mailster.co/WIDTHxHEIGHT.jpg`")
-            print("- **MANDATORY: CSS Resets** - All templates MUST include `margin: 0 !important;` for `h1-h6` and `p/li` tags to prevent browser interference.")
-            print("- **Simple buttons** - Direct `<table class=\"textbutton\">` without complex wrappers")
+            # Pixel-identical sections reuse their approved HTML as is
+            if idx in known:
+                print("\n[KNOWN SECTION] This section matches one approved before:")
+                print("-" * 50)
+                print(known[idx])
+                print("-" * 50)
+                choice = input(f"[HUMAN] Use this HTML for section {idx+1}? (y = use, n = continue): ").strip().lower()
+                if choice == 'y' or choice == 'yes':
+                    final_html_parts.append(known[idx])
+                    session.record(idx, sec, "approved", known[idx])
+                    print(f"[SYSTEM] Section {idx+1} filled from the section index.")
+                    continue
             
-            lines = []
+            # Repeat layouts come straight from the snippet cache, resized to this section
+            cached_html = snippets.lookup(snippet_cache, sec)
+            if cached_html is not None:
+                print("\n[CACHE HIT] A previously approved layout matches this section:")
+                print("-" * 50)
+                print(cached_html)
+                print("-" * 50)
+                choice = input(f"[HUMAN] Use cached HTML for section {idx+1}? (y = use, n = generate new): ").strip().lower()
+                if choice == 'y' or choice == 'yes':
+                    final_html_parts.append(cached_html)
+                    session.record(idx, sec, "approved", cached_html)
+                    print(f"[SYSTEM] Section {idx+1} filled from snippet cache.")
+                    continue
+        
+            # Simple layouts are emitted directly from the blueprint
+            rule_html = fastpath.generate_section(sec) if args.fastpath != "off" else None
+            if rule_html is not None:
+                if args.fastpath == "auto":
+                    final_html_parts.append(rule_html)
+                    session.record(idx, sec, "approved", rule_html)
+                    print(f"[SYSTEM] Section {idx+1} generated by the rule-based fast path.")
+                    continue
+                print("\n[FAST PATH] Rule-based HTML for this section:")
+                print("-" * 50)
+                print(rule_html)
+                print("-" * 50)
+                choice = input(f"[HUMAN] Approve this HTML for section {idx+1}? (y = approve, n = generate with agent): ").strip().lower()
+                if choice == 'y' or choice == 'yes':
+                    final_html_parts.append(rule_html)
+                    session.record(idx, sec, "approved", rule_html)
+                    print(f"[SYSTEM] Section {idx+1} approved and saved.")
+                    continue
+        
+            # Optional: crop the section so the agent can see it directly
+            crop_path = f"section_{idx+1}.png"
+            if session.needs_crop(idx, sec, crop_path):
+                subprocess.run(["python", "worker.py", "--crop", "--input", image_path, "--section", str(idx+1)])
+                session.mark_cropped(idx, sec, crop_path)
+            print(f"\n[SYSTEM] Agent, please look at 'section_{idx+1}.png' and context above.")
+        
             while True:
-                try:
-                    line = input()
-                    if line.strip() == "EOF":
+                print(f"[SYSTEM] Agent, generate the Mailster HTML for Section {idx+1}.")
+                print("Type your HTML code below. When done, type 'EOF' on a new line to submit.")
+                for rule in pipeline.MAILSTER_RULES:
+                    print(rule)
+            
+                lines = []
+                while True:
+                    try:
+                        line = input()
+                        if line.strip() == "EOF":
+                            break
+                        lines.append(line)
+                    except EOFError:
                         break
-                    lines.append(line)
-                except EOFError:
-                    break
             
-            generated_html = "\n".join(lines)
+                generated_html = "\n".join(lines)
             
-            print("\n[HITL REVIEW]")
-            print("-" * 50)
-            print(generated_html)
-            print("-" * 50)
+                print("\n[HITL REVIEW]")
+                print("-" * 50)
+                print(generated_html)
+                print("-" * 50)
             
-            choice = input(f"[HUMAN] Approve this HTML for section {idx+1}? (y = approve, n = retry, s = skip): ").strip().lower()
+                choice = input(f"[HUMAN] Approve this HTML for section {idx+1}? (y = approve, n = retry, s = skip): ").strip().lower()
             
-            if choice == 'y' or choice == 'yes':
-                final_html_parts.append(generated_html)
-                print(f"[SYSTEM] Section {idx+1} approved and saved.")
-                break
-            elif choice == 's' or choice == 'skip':
-                print(f"[SYSTEM] Section {idx+1} skipped.")
-                break
-            else:
-                print(f"[SYSTEM] Human requested retry. Please provide updated HTML.")
+                if choice == 'y' or choice == 'yes':
+                    final_html_parts.append(generated_html)
+                    session.record(idx, sec, "approved", generated_html)
+                    remember(idx, sec, generated_html)
+                    print(f"[SYSTEM] Section {idx+1} approved and saved.")
+                    break
+                elif choice == 's' or choice == 'skip':
+                    session.record(idx, sec, "skipped")
+                    print(f"[SYSTEM] Section {idx+1} skipped.")
+                    break
+                else:
+                    print(f"[SYSTEM] Human requested retry. Please provide updated HTML.")
                 
     # Assemble final template
     print("\n" + "="*40)
     print(" ALL SECTIONS COMPLETED")
     print("="*40)
     
-    header = """<!DOCTYPE html>
-<html lang="{lang}" xmlns:v="urn:schemas-microsoft-com:vml" xmlns:o="urn:schemas-microsoft-com:office:office">
-<head>
-    <meta charset="utf-8" />
-    <meta http-equiv="X-UA-Compatible" content="IE=edge" />
-    <meta name="viewport" content="width=device-width,initial-scale=1 user-scalable=yes" />
-    <meta name="format-detection" content="telephone=no, date=no, address=no, email=no, url=no" />
-    <meta name="x-apple-disable-message-reformatting" />
-    <style type="text/css" data-embed>
-        @import url("https://fonts.googleapis.com/css?family=Raleway:400,700|Open+Sans:400,700");
-
-        @media only screen {
-            h1, h2, h3, h4, h5, h6, table.textbutton a {
-                font-family: Raleway, sans-serif !important;
-                font-weight: 700 !important;
-                margin: 0 !important;
-            }
-            th, td {
-                font-family: "Open Sans", sans-serif !important;
-            }
-            p, li {
-                font-family: "Georgia", "Times New Roman", Times, serif !important;
-                font-weight: 450 !important;
-                margin: 0 !important;
-            }
-        }
-    </style>
-    <style type="text/css">
-        body {
-            width: 100% !important;
-            margin: 0 !important;
-            padding: 0 !important;
-            background-color: #f3f4f4;
-        }
-        table {
-            border-collapse: collapse;
-            mso-table-lspace: 0pt;
-            mso-table-rspace: 0pt;
-            font-family: Helvetica, Arial, sans-serif;
-            font-size: 16px;
-        }
-        .o-fix table, .o-fix td {
-            mso-table-lspace: 0pt;
-            mso-table-rspace: 0pt;
-        }
-        img {
-            outline: none;
-            text-decoration: none;
-            max-width: 100%;
-        }
-        .padd { width: 24px; }
-        table.textbutton td {
-            background: #fecf07;
-            padding: 9px 16px;
-            border-radius: 6px;
-        }
-        table.textbutton a {
-            color: #341ec4;
-            font-size: 18px;
-            text-decoration: none;
-        }
-        @media only screen and (max-width: 599px) {
-            .wrap { width: 96% !important; }
-            .wrap table { width: 100% !important; }
-            .wrap img { max-width: 100% !important; height: auto !important; }
-        }
-    </style>
-    <title>{subject}</title>
-</head>
-<body>
-    <table width="100%" cellpadding="0" cellspacing="0" role="presentation" style="background-color: #f3f4f4;">
-        <tbody>
-            <tr>
-                <td align="center">
-                    <div style="display: none;">{preheader}</div>
-                    
-                    <table width="600" cellpadding="0" cellspacing="0" role="presentation" style="background-color: white">
-                        <tbody>
-                            <tr>
-                                <td width="24" class="padd">&zwnj;</td>
-                                <td width="552" valign="top" align="center">
-                                    <multi label="Body"><p>Click on the <span style="text-decoration: underline;" data-mce-style="text-decoration: underline;"><a href="{webversionlink}" data-mce-href="https://gemengserv.net/sz/wp-admin/{webversionlink}">webview </a></span>if the message is not displayed properly.<br>For business enquiries, write to us at <a href="mailto:business@gemengserv.com?subject=Interest%20in%20your%20service%20offerings&amp;body=You%20can%20type%20your%20requirement%20here." data-mce-href="mailto:business@gemengserv.com?subject=Interest%20in%20your%20service%20offerings&amp;body=You%20can%20type%20your%20requirement%20here.">business@gemengserv.com </a></p></multi>
-                                </td>
-                                <td width="24" class="padd">&zwnj;</td>
-                            </tr>
-                            <tr>
-                                <td width="24" class="padd">&zwnj;</td>
-                                <td width="552" valign="top" align="center">
-                                    <img src="https://gemengserv.com/wp-content/uploads/2025/09/GEM-logo_sept2025.png" alt="Header Image 1" width="120" height="auto" border="0" editable="" class="">
-                                </td>
-                                <td width="24" class="padd">&zwnj;</td>
-                            </tr>
-"""
-    footer = """                            <tr>
-                                <td width="24" class="padd" style="background-color: #ffffff;" bgcolor="#ffffff">&zwnj;</td>
-                                <td width="552" valign="top" style="background-color: #ffffff;" bgcolor="#ffffff">
-                                    <table cellpadding="0" cellspacing="0" class="o-fix" role="presentation" style="background-color: #ffffff;" bgcolor="#ffffff">
-                                        <tbody>
-                                            <tr>
-                                                <td valign="top" align="left" style="background-color: #ffffff;" bgcolor="#ffffff">
-                                                    <multi label="Body"><p style="font-size: 12px !important; line-height: 1.4em;" data-mce-style="font-size: 12px !important; line-height: 1.4em;">Liked this newsletter? Send it to your colleagues and help us grow. You have received this email because you have subscribed to GEM Engserv as {emailaddress}. If you no longer wish to receive emails please <strong><a href="https://gemengserv.com/gem-newsletter-unsubscribe/" data-mce-href="https://gemengserv.com/gem-newsletter-unsubscribe/">Unsubscribe.</a></strong></p></multi>
-                                                </td>
-                                            </tr>
-                                        </tbody>
-                                    </table>
-                                </td>
-                                <td width="24" class="padd" style="background-color: #ffffff;" bgcolor="#ffffff">&zwnj;</td>
-                            </tr>
-                            <tr>
-                                <td height="12" colspan="3" style="background-color: #ffffff;" bgcolor="#ffffff"></td>
-                            </tr>
-                        </tbody>
-                    </table>
-
-                    <table width="600" cellpadding="0" cellspacing="0" role="presentation" style="background-color: #ffffff;" bgcolor="#ffffff" class="content-bg">
-                        <tbody>
-                            <tr>
-                                <td width="600" valign="top" align="left" style="background-color: #ffffff;" bgcolor="#ffffff">
-                                    <table cellpadding="0" cellspacing="0" role="presentation" style="background-color: #ffffff;" bgcolor="#ffffff">
-                                        <tbody>
-                                            <tr>
-                                                <td width="600" valign="top" align="center" style="background-color: #ffffff;" bgcolor="#ffffff"><img src="https://gemengserv.net/sz/wp-content/uploads/mailster/templates/mymail/img/shadow.png" alt="Shadow for Newsletter" width="600" height="25" border="0" style="max-width: 600px; max-height: 25px">
-                                                </td>
-                                            </tr>
-                                        </tbody>
-                                    </table>
-                                </td>
-                            </tr>
-                        </tbody>
-                    </table>                    
-                </td>
-            </tr>
-        </tbody>
-    </table>
-</body>
-</html>"""
-    final_html = header + "\n".join(final_html_parts) + "\n" + footer
+    if args.variants:
+        for variant in templating.load_variants(args.variants):
+            out_path = f"mailster_template_{variant['name']}.html"
+            size = assemble.write_template(out_path, header.render(variant), final_html_parts,
+                                           footer.render(variant), minify=args.minify)
+            print(f"[SYSTEM] Output saved to {out_path}.")
+            print(assemble.size_report(size))
+        print("[SYSTEM] Pipeline finished.")
+        return
     
-    with open("mailster_template.html", "w") as f:
-        f.write(final_html)
+    size = assemble.write_template("mailster_template.html", header.render(), final_html_parts, footer.render(), minify=args.minify)
     print("[SYSTEM] Output saved to mailster_template.html. Pipeline finished.")
+    print(assemble.size_report(size))
 
 if __name__ == "__main__":
     main()
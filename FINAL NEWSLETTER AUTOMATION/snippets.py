@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import re
+
+SNIPPET_CACHE = "snippet_cache.json"
+
+# Skeletons are 2400px wide, the template is 600px (the 0.25x Scaling Rule)
+SCALE = 0.25
+# Positions and widths are snapped to this grid inside the 552px content column
+GRID = 24
+
+PLACEHOLDER_RE = re.compile(r"https://dummy\.mailster\.co/(\d+)x(\d+)\.jpg")
+IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+WIDTH_ATTR_RE = re.compile(r'\bwidth="\d+"')
+
+def quantize(value):
+    return int(round(value * SCALE / GRID))
+
+def assign_rows(elements):
+    # Elements whose vertical extents overlap share a row
+    rows = []
+    row = -1
+    bottom = None
+    for e in sorted(elements, key=lambda e: e["y"]):
+        if bottom is None or e["y"] >= bottom:
+            row += 1
+            bottom = e["y"] + e["height"]
+        else:
+            bottom = max(bottom, e["y"] + e["height"])
+        rows.append((row, e))
+    return rows
+
+def ordered_elements(section):
+    rows = assign_rows(section.get("elements", []))
+    rows.sort(key=lambda r: (r[0], r[1]["x"]))
+    return rows
+
+def fingerprint(section):
+    # Structural key: section width plus element type, row and x/width in the
+    # 552px column. Heights are left out so taller images still match.
+    shape = [quantize(section["width"])]
+    for row, e in ordered_elements(section):
+        shape.append([e["type"], row, quantize(e["x"] - section["x"]), quantize(e["width"])])
+    return hashlib.sha1(json.dumps(shape).encode()).hexdigest()
+
+def placeholder_sizes(section):
+    images = [e for _, e in ordered_elements(section) if e["type"] == "image"]
+    boxes = images or [section]
+    return [(int(round(b["width"] * SCALE)), int(round(b["height"] * SCALE))) for b in boxes]
+
+def resize_placeholders(html, section):
+    # Re-point every dummy.mailster.co placeholder (and its <img width>) at the
+    # new geometry, in reading order. Left untouched if the counts differ.
+    sizes = placeholder_sizes(section)
+    if len(PLACEHOLDER_RE.findall(html)) != len(sizes):
+        return html
+    sizes = iter(sizes)
+    html = PLACEHOLDER_RE.sub(lambda m: "https://dummy.mailster.co/{}x{}.jpg".format(*next(sizes)), html)
+
+    def fix_width(match):
+        tag = match.group(0)
+        placeholder = PLACEHOLDER_RE.search(tag)
+        if placeholder is None:
+            return tag
+        return WIDTH_ATTR_RE.sub(f'width="{placeholder.group(1)}"', tag, count=1)
+
+    return IMG_TAG_RE.sub(fix_width, html)
+
+def load_cache(path=SNIPPET_CACHE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        cache = json.load(f)
+    # Re-key from each entry's section, so entries stored under an older
+    # fingerprint are still found
+    return {fingerprint(entry["section"]): entry for entry in cache.values()}
+
+def save_cache(cache, path=SNIPPET_CACHE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, path)
+
+def lookup(cache, section):
+    entry = cache.get(fingerprint(section))
+    if entry is None:
+        return None
+    return resize_placeholders(entry["html"], section)
+
+def store(cache, section, html):
+    cache[fingerprint(section)] = {"html": html, "section": section}
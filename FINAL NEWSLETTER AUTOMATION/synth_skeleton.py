@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+import json
+import argparse
+import os
+import random
+
+# Synthetic skeletons with known ground truth for benchmark.py. Sections are
+# light panels on white, laid out as rows of 1-3 cells; every cell holds one
+# text bar, image box or button in the colours worker.py looks for.
+
+PANEL = (236, 236, 236)     # under the 240 section threshold, over the image grey range
+TEXT = (0, 0, 0)
+IMAGE = (150, 150, 150)
+BUTTON = (7, 207, 254)      # #fecf07 in BGR
+COLORS = {"text": TEXT, "image": IMAGE, "button": BUTTON}
+
+BASE_WIDTH = 600  # template width; everything below is in template pixels
+
+def make_skeleton(width=2400, sections=8, density=3, seed=0):
+    # density = maximum number of element rows per section
+    rng = random.Random(seed)
+    s = width / BASE_WIDTH
+    gap, pad = int(24 * s), int(12 * s)
+    rows_spec = []
+    for _ in range(sections):
+        rows = []
+        for _ in range(rng.randint(1, max(1, density))):
+            cols = rng.choice([1, 1, 2, 2, 3])
+            height = int(rng.choice([24, 40, 120, 200]) * s)
+            rows.append((cols, height))
+        rows_spec.append(rows)
+
+    total_h = gap + sum(sum(h for _, h in rows) + pad * (len(rows) + 1) + gap for rows in rows_spec)
+    img = np.full((total_h, width, 3), 255, np.uint8)
+    truth = {"width": width, "height": total_h, "seed": seed, "sections": []}
+
+    y = gap
+    for si, rows in enumerate(rows_spec):
+        margin = int(rng.choice([0, 24, 48]) * s)
+        x0, x1 = margin, width - margin
+        h = sum(rh for _, rh in rows) + pad * (len(rows) + 1)
+        cv2.rectangle(img, (x0, y), (x1 - 1, y + h - 1), PANEL, -1)
+        section = {"id": f"section_{si+1}", "x": x0, "y": y, "width": x1 - x0, "height": h, "elements": []}
+
+        ry = y + pad
+        for cols, rh in rows:
+            cell_w = (x1 - x0 - pad * (cols + 1)) // cols
+            for c in range(cols):
+                cx = x0 + pad + c * (cell_w + pad)
+                elem_type = rng.choice(["text", "text", "image", "button"])
+                if elem_type == "button":
+                    ew, eh = min(cell_w, int(160 * s)), min(rh, int(40 * s))
+                elif elem_type == "text":
+                    ew, eh = int(cell_w * rng.uniform(0.4, 1.0)), min(rh, int(16 * s))
+                else:
+                    ew, eh = cell_w, rh
+                cv2.rectangle(img, (cx, ry), (cx + ew - 1, ry + eh - 1), COLORS[elem_type], -1)
+                section["elements"].append({"type": elem_type, "x": cx, "y": ry, "width": ew, "height": eh})
+            ry += rh + pad
+
+        truth["sections"].append(section)
+        y += h + gap
+    return img, truth
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic skeletons with ground-truth JSON for benchmark.py.")
+    parser.add_argument("--outdir", type=str, default="synthetic", help="Output directory")
+    parser.add_argument("--count", type=int, default=5, help="Number of skeletons to generate")
+    parser.add_argument("--width", type=int, nargs="+", default=[2400], help="Image width(s); 1200 is @2x, 2400 is @4x")
+    parser.add_argument("--sections", type=int, default=8, help="Sections per skeleton")
+    parser.add_argument("--density", type=int, default=3, help="Maximum element rows per section")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first skeleton")
+
+    args = parser.parse_args()
+
+    os.makedirs(args.outdir, exist_ok=True)
+    files = []
+    for width in args.width:
+        for i in range(args.count):
+            img, truth = make_skeleton(width, args.sections, args.density, args.seed + i)
+            base = os.path.join(args.outdir, f"synth_{width}_{i+1:03d}")
+            cv2.imwrite(base + ".png", img)
+            with open(base + ".json", "w") as f:
+                json.dump(truth, f, indent=2)
+            files.append({"image": base + ".png", "truth": base + ".json"})
+    print(json.dumps({"status": "success", "files": files}, indent=2))
@@ -0,0 +1,56 @@
+import json
+import re
+
+# Precompiled boilerplate for runner.py. The master template is parsed once
+# into literal chunks and {slot} positions; rendering a variant only fills the
+# slot positions and joins the chunks, so many editions cost one scan.
+
+DEFAULT_TEMPLATE = "Master Template.html"
+MODULES_START = "<!-- MODULES START -->"
+MODULES_END = "<!-- MODULES END -->"
+
+# Mailster placeholders are {lowercase_names}; CSS braces never match this
+SLOT_RE = re.compile(r"\{([a-z_][a-z0-9_]*)\}")
+
+class CompiledTemplate:
+    def __init__(self, text):
+        # Even indexes hold literal text, odd indexes hold slot names
+        parts = SLOT_RE.split(text)
+        self.chunks = parts[:]
+        self.slots = [(i, parts[i]) for i in range(1, len(parts), 2)]
+        for i, name in self.slots:
+            # Unfilled slots render back as the original Mailster placeholder
+            self.chunks[i] = "{" + name + "}"
+
+    @property
+    def slot_names(self):
+        return sorted({name for _, name in self.slots})
+
+    def render(self, values=None):
+        if not values:
+            return "".join(self.chunks)
+        chunks = self.chunks[:]
+        for i, name in self.slots:
+            if name in values:
+                chunks[i] = str(values[name])
+        return "".join(chunks)
+
+def load_boilerplate(path=DEFAULT_TEMPLATE):
+    # Header is everything before MODULES START, footer everything after MODULES END
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    start = text.find(MODULES_START)
+    end = text.find(MODULES_END)
+    if start == -1 or end == -1 or end < start:
+        raise ValueError(f"{path} must contain {MODULES_START} and {MODULES_END} markers around the modules")
+    header = text[:start].rstrip(" ")
+    footer = text[end + len(MODULES_END):].lstrip("\r\n")
+    return CompiledTemplate(header), CompiledTemplate(footer)
+
+def load_variants(path):
+    # A JSON list of slot values, one object per edition, each with a "name"
+    with open(path, "r", encoding="utf-8") as f:
+        variants = json.load(f)
+    for i, variant in enumerate(variants):
+        variant.setdefault("name", f"variant_{i+1}")
+    return variants
@@ -0,0 +1,219 @@
+import cv2
+import numpy as np
+import json
+import argparse
+import os
+
+import worker
+
+# Visual regression check: render the assembled template, run the same
+# worker.py extraction on the screenshot and compare both blueprints box by box.
+
+TEMPLATE_WIDTH = 600
+PLACEHOLDER_GREY = 231  # same grey as the skeleton image boxes
+
+# Paint text as black bars and buttons as plain yellow pills, like the skeleton
+SKELETON_CSS = """
+h1, h2, h3, h4, h5, h6, p, li, span, strong, em { color: #000 !important; background: #000 !important; }
+a { color: #000 !important; background: #000 !important; text-decoration: none !important; }
+table.textbutton td, table.textbutton td * { background: #fecf07 !important; color: #fecf07 !important; }
+"""
+
+# Page span (CSS px) between the <!-- MODULES START/END --> comments that
+# assemble.py leaves in place; null if the template has no markers
+MODULES_REGION_JS = """
+() => {
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_COMMENT);
+    let start = null, end = null;
+    while (walker.nextNode()) {
+        const text = walker.currentNode.nodeValue.trim();
+        if (text === "MODULES START") start = walker.currentNode;
+        if (text === "MODULES END") end = walker.currentNode;
+    }
+    if (!start || !end) return null;
+    const range = document.createRange();
+    range.setStartAfter(start);
+    range.setEndBefore(end);
+    const rect = range.getBoundingClientRect();
+    return {top: rect.top + window.scrollY, bottom: rect.bottom + window.scrollY};
+}
+"""
+
+def placeholder_png(url):
+    # https://dummy.mailster.co/WIDTHxHEIGHT.jpg -> flat grey PNG of that size
+    name = url.rsplit("/", 1)[-1].split(".")[0]
+    try:
+        width, height = (max(1, int(v)) for v in name.split("x"))
+    except ValueError:
+        width, height = 1, 1
+    ok, buf = cv2.imencode(".png", np.full((height, width, 3), PLACEHOLDER_GREY, np.uint8))
+    return buf.tobytes()
+
+def render_html(html_path, out_path, width):
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        raise RuntimeError("Playwright is required to render templates: pip install playwright && playwright install chromium")
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page(viewport={"width": TEMPLATE_WIDTH, "height": 800},
+                                device_scale_factor=width / TEMPLATE_WIDTH)
+        page.route("https://dummy.mailster.co/**",
+                   lambda route: route.fulfill(status=200, content_type="image/png", body=placeholder_png(route.request.url)))
+        page.goto("file://" + os.path.abspath(html_path))
+        page.add_style_tag(content=SKELETON_CSS)
+        page.wait_for_load_state("networkidle")
+        page.screenshot(path=out_path, full_page=True)
+        region = page.evaluate(MODULES_REGION_JS)
+        browser.close()
+
+    # Keep only the modules: the boilerplate header, spacers and footer are not in the skeleton
+    if region:
+        scale = width / TEMPLATE_WIDTH
+        shot = cv2.imread(out_path)
+        top, bottom = int(region["top"] * scale), int(round(region["bottom"] * scale))
+        if shot is not None and bottom > top:
+            cv2.imwrite(out_path, shot[top:bottom])
+    return out_path
+
+def iou_matrix(a, b):
+    # a: (n, 4), b: (m, 4) boxes as x, y, w, h -> (n, m) IoU, fully vectorized
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    ax0, ay0 = a[:, 0:1], a[:, 1:2]
+    ax1, ay1 = ax0 + a[:, 2:3], ay0 + a[:, 3:4]
+    bx0, by0 = b[:, 0], b[:, 1]
+    bx1, by1 = bx0 + b[:, 2], by0 + b[:, 3]
+    iw = np.clip(np.minimum(ax1, bx1) - np.maximum(ax0, bx0), 0, None)
+    ih = np.clip(np.minimum(ay1, by1) - np.maximum(ay0, by0), 0, None)
+    inter = iw * ih
+    union = (a[:, 2:3] * a[:, 3:4]) + (b[:, 2] * b[:, 3]) - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+def relative_boxes(section, scale):
+    # Element boxes relative to their section origin, in skeleton pixels
+    return [[(e["x"] - section["x"]) * scale, (e["y"] - section["y"]) * scale,
+             e["width"] * scale, e["height"] * scale] for e in section["elements"]]
+
+def compare_sections(expected, rendered, scale, threshold):
+    boxes_e = relative_boxes(expected, 1.0)
+    boxes_r = relative_boxes(rendered, scale)
+    size_iou = float(iou_matrix([[0, 0, expected["width"], expected["height"]]],
+                                [[0, 0, rendered["width"] * scale, rendered["height"] * scale]])[0, 0])
+    ious = iou_matrix(boxes_e, boxes_r)
+    types_e = np.array([e["type"] for e in expected["elements"]])
+    types_r = np.array([e["type"] for e in rendered["elements"]])
+    if ious.size:
+        # Boxes of a different element type never match
+        ious = np.where(types_e[:, None] == types_r[None, :], ious, 0.0)
+
+    # Greedy one-to-one matching on the highest IoU first
+    matched_e, matched_r, scores = set(), set(), []
+    if ious.size:
+        for flat in np.argsort(ious, axis=None)[::-1]:
+            i, j = np.unravel_index(flat, ious.shape)
+            if ious[i, j] < threshold:
+                break
+            if i in matched_e or j in matched_r:
+                continue
+            matched_e.add(i)
+            matched_r.add(j)
+            scores.append(float(ious[i, j]))
+
+    return {
+        "section": expected["id"],
+        "section_iou": round(size_iou, 3),
+        "mean_element_iou": round(float(np.mean(scores)), 3) if scores else None,
+        "unmatched_expected": [expected["elements"][i]["id"] for i in range(len(boxes_e)) if i not in matched_e],
+        "unmatched_rendered": [rendered["elements"][j]["id"] for j in range(len(boxes_r)) if j not in matched_r],
+    }
+
+def match_sections(expected, found, scale, threshold):
+    # Order-preserving alignment (like a diff): sections keep their vertical
+    # order, so extra or missing sections on either side are skipped instead
+    # of shifting every later pair. Pairs score by size IoU (boxes aligned at
+    # the origin) weighted by how close their relative vertical positions are.
+    def centre(sections, factor):
+        total = max((s["y"] + s["height"]) * factor for s in sections) if sections else 1
+        return [(s["y"] + s["height"] / 2) * factor / total for s in sections]
+
+    ce, cf = np.array(centre(expected, 1.0)), np.array(centre(found, scale))
+    n, m = len(expected), len(found)
+    expected_boxes = [[0, 0, s["width"], s["height"]] for s in expected]
+    rendered_boxes = [[0, 0, s["width"] * scale, s["height"] * scale] for s in found]
+    score = iou_matrix(expected_boxes, rendered_boxes) * (1 - np.abs(ce[:, None] - cf[None, :]))
+
+    # best[i][j] = best total over expected[i:], found[j:]
+    best = np.zeros((n + 1, m + 1))
+    for i in range(n - 1, -1, -1):
+        for j in range(m - 1, -1, -1):
+            pair = best[i + 1, j + 1] + score[i, j] if score[i, j] >= threshold / 2 else -1
+            best[i, j] = max(pair, best[i + 1, j], best[i, j + 1])
+
+    pairs, i, j = [], 0, 0
+    while i < n and j < m:
+        if score[i, j] >= threshold / 2 and best[i, j] == best[i + 1, j + 1] + score[i, j]:
+            pairs.append((i, j))
+            i, j = i + 1, j + 1
+        elif best[i, j] == best[i + 1, j]:
+            i += 1
+        else:
+            j += 1
+    return pairs
+
+def verify(skeleton_path, rendered_path, threshold=0.5):
+    skeleton = worker.load_image(skeleton_path)
+    rendered = worker.load_image(rendered_path)
+    if skeleton is None or rendered is None:
+        return {"error": f"Could not open {skeleton_path if skeleton is None else rendered_path}"}
+
+    expected = worker.analyze_array(skeleton)["sections"]
+    found = worker.analyze_array(rendered)["sections"]
+    # Map rendered pixels onto the skeleton's scale
+    scale = skeleton.shape[1] / rendered.shape[1]
+
+    pairs = match_sections(expected, found, scale, threshold)
+    mismatches = []
+    for i, j in pairs:
+        result = compare_sections(expected[i], found[j], scale, threshold)
+        result["rendered_section"] = found[j]["id"]
+        if result["section_iou"] < threshold or result["unmatched_expected"] or result["unmatched_rendered"]:
+            mismatches.append(result)
+    paired_e = {i for i, _ in pairs}
+    paired_r = {j for _, j in pairs}
+    missing = [s["id"] for i, s in enumerate(expected) if i not in paired_e]
+    extra = [s["id"] for j, s in enumerate(found) if j not in paired_r]
+
+    return {
+        "skeleton": skeleton_path,
+        "rendered": rendered_path,
+        "sections_expected": len(expected),
+        "sections_rendered": len(found),
+        "mismatches": mismatches,
+        "unmatched_expected_sections": missing,
+        "unmatched_rendered_sections": extra,
+        "ok": not mismatches and not missing and not extra,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare a rendered Mailster template against its skeleton.")
+    parser.add_argument("--skeleton", type=str, default="Skeleton.png", help="Skeleton image the template was built from")
+    parser.add_argument("--html", type=str, default="mailster_template.html", help="Assembled template to render")
+    parser.add_argument("--rendered", type=str, default="rendered_template.png",
+                        help="Screenshot path; rendering is skipped with --no-render")
+    parser.add_argument("--no-render", action="store_true", help="Reuse an existing --rendered screenshot")
+    parser.add_argument("--threshold", type=float, default=0.5, help="Minimum IoU for two boxes to match")
+
+    args = parser.parse_args()
+
+    if not args.no_render:
+        skeleton = cv2.imread(args.skeleton)
+        if skeleton is None:
+            print(json.dumps({"error": f"Could not open or find the image {args.skeleton}"}))
+            exit(1)
+        render_html(args.html, args.rendered, skeleton.shape[1])
+
+    result = verify(args.skeleton, args.rendered, args.threshold)
+    print(json.dumps(result, indent=2))
+    exit(0 if result.get("ok") else 1)
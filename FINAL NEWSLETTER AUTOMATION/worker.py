@@ -3,27 +3,125 @@ import numpy as np
 import json
 import argparse
 import os
+import hashlib
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
-def identify_elements(img, x_offset, y_offset):
-    elements = []
-    
-    # Define color ranges in HSV
+# Decoded skeletons are cached here as uncompressed .npy files (see --npy-cache)
+CACHE_DIR = ".worker_cache"
+
+# worker.py --serve listens here (localhost only)
+DAEMON_PORT = 8765
+
+# Minimum whitespace run (in full-resolution pixels) that separates two
+# sections for the XY-cut segmenter. 48px @2x is 12px in the 600px template.
+XYCUT_MIN_GAP = 48
+
+# Colour classes for element detection, as HSV ranges (OpenCV scale: H 0-180).
+# Several entries may share a type, e.g. a red class wrapping around H=0.
+PROFILES_FILE = "color_profiles.json"
+DEFAULT_PROFILES = [
+    {"type": "text", "lower": [0, 0, 0], "upper": [180, 255, 30]},       # black
+    {"type": "image", "lower": [0, 0, 50], "upper": [180, 50, 230]},     # grey
+    {"type": "button", "lower": [20, 100, 100], "upper": [40, 255, 255]}, # yellow
+]
+_compiled_profiles = {}
+
+@contextmanager
+def stage(timings, name):
+    # Adds the elapsed seconds to timings[name]; a no-op without a timings dict
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+def load_profiles(path=PROFILES_FILE):
+    # Colour classes from the profiles file (or the built-in defaults), compiled
+    # into lookup tables. Compiled tables are cached in CACHE_DIR by content hash.
+    if path and os.path.exists(path):
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    else:
+        key = None
+    if key in _compiled_profiles:
+        return _compiled_profiles[key]
+
+    if key is None:
+        profiles = DEFAULT_PROFILES
+    else:
+        with open(path, "r") as f:
+            profiles = json.load(f)
+    if len(profiles) > 8:
+        raise ValueError(f"At most 8 colour ranges are supported, {path} has {len(profiles)}")
+    types = []
+    for p in profiles:
+        if p["type"] not in types:
+            types.append(p["type"])
+
+    digest = hashlib.sha1(json.dumps(profiles, sort_keys=True).encode()).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, f"profiles_{digest}.npy")
+    if os.path.exists(cache_path):
+        tables = np.load(cache_path)
+    else:
+        tables = compile_profiles(profiles, types)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.save(cache_path, tables)
+
+    _compiled_profiles[key] = (types, tables)
+    return types, tables
+
+def compile_profiles(profiles, types):
+    # HSV ranges are boxes, so the 3D (H, S, V) -> class table factors into one
+    # 256-entry bit table per channel: bit i is set where range i contains the
+    # value, and a pixel is in range i when the bit survives all three ANDs.
+    # Row 3 resolves the surviving bits to a class id (1-based, earlier wins).
+    tables = np.zeros((4, 256), np.uint8)
+    for bit, p in enumerate(profiles):
+        for channel in range(3):
+            lo, hi = p["lower"][channel], p["upper"][channel]
+            tables[channel, lo:hi + 1] |= 1 << bit
+    for bits in range(1, 256):
+        first = (bits & -bits).bit_length() - 1
+        if first < len(profiles):
+            tables[3, bits] = types.index(profiles[first]["type"]) + 1
+    return tables
+
+def classify(img, profiles=None):
+    # One class-id map for every colour class: three channel lookups, two ANDs
+    # and a resolve lookup, however many classes the profiles define
+    types, tables = load_profiles(PROFILES_FILE if profiles is None else profiles)
+    # The lookups run in place on the HSV image and the ANDs read its channels
+    # directly, so the class map is the only other buffer allocated
     hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    
-    # Black (Text)
-    lower_black = np.array([0, 0, 0])
-    upper_black = np.array([180, 255, 30])
-    mask_black = cv2.inRange(hsv, lower_black, upper_black)
-    
-    # Grey (Image) - Adjust ranges carefully based on typical skeleton grey
-    lower_grey = np.array([0, 0, 50])
-    upper_grey = np.array([180, 50, 230])
-    mask_grey = cv2.inRange(hsv, lower_grey, upper_grey)
-    
-    # Yellow (Button)
-    lower_yellow = np.array([20, 100, 100])
-    upper_yellow = np.array([40, 255, 255])
-    mask_yellow = cv2.inRange(hsv, lower_yellow, upper_yellow)
+    cv2.LUT(hsv, np.ascontiguousarray(tables[:3].T).reshape(256, 1, 3), dst=hsv)
+    labels = np.bitwise_and(hsv[..., 0], hsv[..., 1])
+    np.bitwise_and(labels, hsv[..., 2], out=labels)
+    del hsv
+    cv2.LUT(labels, tables[3], dst=labels)
+    return types, labels
+
+def element_masks(img, profiles=None):
+    return class_masks(*classify(img, profiles))
+
+def class_masks(types, labels):
+    # Yields (mask, type) per class through one scratch buffer: each mask is
+    # only valid until the next one is produced
+    mask = np.empty_like(labels)
+    for i, elem_type in enumerate(types):
+        cv2.compare(labels, i + 1, cv2.CMP_EQ, dst=mask)
+        yield mask, elem_type
+
+def identify_elements(img, x_offset, y_offset, masks=None, profiles=None):
+    # masks may be precomputed by the caller for this same view
+    if masks is None:
+        masks = element_masks(img, profiles)
+    elements = []
     
     def find_and_append(mask, elem_type):
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
@@ -39,41 +137,177 @@ def identify_elements(img, x_offset, y_offset):
                     "height": h
                 })
                 
-    find_and_append(mask_black, "text")
-    find_and_append(mask_grey, "image")
-    find_and_append(mask_yellow, "button")
+    for mask, elem_type in masks:
+        find_and_append(mask, elem_type)
     
     # Sort elements top to bottom
     elements.sort(key=lambda e: e['y'])
     
     return elements
 
-def analyze_image(filepath):
-    img = cv2.imread(filepath)
-    if img is None:
-        return {"error": f"Could not open or find the image {filepath}"}
-    
-    # Simple approach to find sections: find horizontal lines 
-    # Or find large bounding boxes. Let's use edge detection to find sections
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY_INV)
+def contour_sections(thresh):
     contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
+    # reversed often gives top-to-bottom
+    return [cv2.boundingRect(cnt) for cnt in reversed(contours)]
+
+def _content_spans(occupied, min_gap):
+    # [start, end) spans of occupied lines separated by at least min_gap empty lines
+    idx = np.flatnonzero(occupied)
+    if idx.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(idx) > min_gap)
+    starts = np.concatenate(([idx[0]], idx[breaks + 1]))
+    ends = np.concatenate((idx[breaks], [idx[-1]])) + 1
+    return list(zip(starts.tolist(), ends.tolist()))
+
+def xycut_sections(thresh, min_gap=XYCUT_MIN_GAP):
+    # Recursive XY-cut: split on horizontal whitespace runs first, then on
+    # vertical ones, until a block cannot be cut any further.
+    fg = thresh > 0
+    boxes = []
+
+    def cut(x0, y0, x1, y1):
+        region = fg[y0:y1, x0:x1]
+        row_spans = _content_spans(region.any(axis=1), min_gap)
+        if len(row_spans) > 1:
+            for top, bottom in row_spans:
+                cut(x0, y0 + top, x1, y0 + bottom)
+            return
+        if not row_spans:
+            return
+        top, bottom = row_spans[0]
+        col_spans = _content_spans(region[top:bottom].any(axis=0), min_gap)
+        if len(col_spans) > 1:
+            for left, right in col_spans:
+                cut(x0 + left, y0 + top, x0 + right, y0 + bottom)
+            return
+        left, right = col_spans[0]
+        boxes.append((x0 + left, y0 + top, right - left, bottom - top))
+
+    cut(0, 0, fg.shape[1], fg.shape[0])
+    return boxes
+
+def pyramid_sections(gray, scale, segment=contour_sections):
+    # Min-pool the grayscale image into scale x scale blocks so that any
+    # non-white pixel survives the downsample, then find the section bands
+    # on the small image and refine each one at full resolution.
+    h, w = gray.shape
+    small = cv2.erode(gray, np.ones((scale, scale), np.uint8), anchor=(0, 0))[::scale, ::scale]
+    _, small_thresh = cv2.threshold(small, 240, 255, cv2.THRESH_BINARY_INV)
+
+    boxes = []
+    for sx, sy, sw, sh in segment(small_thresh):
+        x0, y0 = sx * scale, sy * scale
+        x1, y1 = min((sx + sw) * scale, w), min((sy + sh) * scale, h)
+        # Tight bounding box of the foreground inside the candidate region only
+        _, window = cv2.threshold(gray[y0:y1, x0:x1], 240, 255, cv2.THRESH_BINARY_INV)
+        x, y, bw, bh = cv2.boundingRect(window)
+        if bw == 0 or bh == 0:
+            continue
+        boxes.append((x0 + x, y0 + y, bw, bh))
+    return boxes
+
+SEGMENTERS = ["contour", "xycut"]
+
+def find_sections(img, pyramid=1, segmenter="contour", timings=None):
+    if segmenter == "xycut":
+        min_gap = max(1, XYCUT_MIN_GAP // max(pyramid, 1))
+        segment = lambda thresh: xycut_sections(thresh, min_gap)
+    elif segmenter == "contour":
+        segment = contour_sections
+    else:
+        raise ValueError(f"Unknown segmenter {segmenter}. Choose from {SEGMENTERS}")
+    with stage(timings, "threshold"):
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if pyramid <= 1:
+            _, thresh = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY_INV)
+    with stage(timings, "contours"):
+        if pyramid > 1:
+            return pyramid_sections(gray, pyramid, segment)
+        return segment(thresh)
+
+def file_key(filepath):
+    # Identity of a file's current contents: path, mtime and size
+    if not filepath or not os.path.exists(filepath):
+        return None
+    st = os.stat(filepath)
+    return (os.path.abspath(filepath), st.st_mtime_ns, st.st_size)
+
+def load_image(filepath, use_cache=False, timings=None):
+    # Decode the skeleton once. With use_cache the decoded pixels are kept as
+    # an uncompressed .npy so repeat runs memory-map them instead of decoding.
+    if not use_cache:
+        with stage(timings, "decode"):
+            return cv2.imread(filepath)
+    key = file_key(filepath)
+    if key is None:
+        return None
+    key = hashlib.sha1("|".join(map(str, key)).encode()).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, f"{key}.npy")
+    if os.path.exists(cache_path):
+        with stage(timings, "decode"):
+            return np.load(cache_path, mmap_mode="r")
+    with stage(timings, "decode"):
+        img = cv2.imread(filepath)
+    if img is not None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.save(cache_path, img)
+    return img
+
+def sweep_groups(items, start, size):
+    # Sort by start, then merge items whose [start, start + size) intervals
+    # overlap into one group: a single O(n log n) sweep, no pairwise checks
+    groups = []
+    end = None
+    for item in sorted(items, key=lambda i: i[start]):
+        if end is None or item[start] >= end:
+            groups.append([item])
+            end = item[start] + item[size]
+        else:
+            groups[-1].append(item)
+            end = max(end, item[start] + item[size])
+    return groups
+
+def span(items, start, size):
+    lo = min(i[start] for i in items)
+    return lo, max(i[start] + i[size] for i in items) - lo
+
+def layout_tree(elements):
+    # section -> rows (overlapping y extents) -> columns (overlapping x extents
+    # inside a row) -> element ids top to bottom, in reading order
+    rows = []
+    for row in sweep_groups(elements, "y", "height"):
+        columns = []
+        for column in sweep_groups(row, "x", "width"):
+            x, w = span(column, "x", "width")
+            columns.append({"x": x, "width": w, "elements": [e["id"] for e in sorted(column, key=lambda e: e["y"])]})
+        y, h = span(row, "y", "height")
+        rows.append({"y": y, "height": h, "columns": columns})
+    return {"rows": rows}
+
+def analyze_array(img, pyramid=1, segmenter="contour", timings=None, profiles=None):
+    # Sections are the large external blobs of non-white pixels. In pyramid
+    # mode they are located on a downsampled copy and refined at full size.
     sections = []
     
     # We assume large external contours are sections
-    for i, cnt in enumerate(reversed(contours)): # reversed often gives top-to-bottom
-        x, y, w, h = cv2.boundingRect(cnt)
+    for i, (x, y, w, h) in enumerate(find_sections(img, pyramid, segmenter, timings)):
         if w > 100 and h > 50: # Minimum section size
-            section_img = img[y:y+h, x:x+w]
-            elements = identify_elements(section_img, x, y)
+            # Colour masks only for the section's view, never the whole page
+            view = img[y:y+h, x:x+w]
+            # The class map is built eagerly here; the masks are derived lazily from it
+            with stage(timings, "hsv"):
+                types, labels = classify(view, profiles)
+            with stage(timings, "elements"):
+                elements = identify_elements(view, x, y, class_masks(types, labels))
             sections.append({
                 "id": f"section_{i+1}",
                 "x": x,
                 "y": y,
                 "width": w,
                 "height": h,
-                "elements": elements
+                "elements": elements,
+                "layout": layout_tree(elements)
             })
             
     # Sort sections top to bottom 
@@ -84,12 +318,31 @@ def analyze_image(filepath):
             
     return {"sections": sections}
 
-def crop_section(filepath, section_index, output_dir="."):
-    img = cv2.imread(filepath)
-    analysis = analyze_image(filepath)
-    
-    if "error" in analysis:
-        return analysis
+def analyze_image(filepath, pyramid=1, segmenter="contour", use_cache=False, timings=None, profiles=None):
+    img = load_image(filepath, use_cache, timings)
+    if img is None:
+        return {"error": f"Could not open or find the image {filepath}"}
+    return analyze_array(img, pyramid, segmenter, timings, profiles)
+
+def crop_path(section_index, output_dir="."):
+    return os.path.join(output_dir, f"section_{section_index}.png")
+
+def write_crop(img, s, section_index, output_dir="."):
+    out_path = crop_path(section_index, output_dir)
+    if not cv2.imwrite(out_path, img[s['y']:s['y']+s['height'], s['x']:s['x']+s['width']]):
+        raise OSError(f"Could not write {out_path}")
+    return out_path
+
+def write_crops(img, sections, output_dir=".", only=None):
+    # only: 1-based indices to (re)write; the other crops are left as they are
+    return [write_crop(img, s, i + 1, output_dir) if only is None or i + 1 in only else crop_path(i + 1, output_dir)
+            for i, s in enumerate(sections)]
+
+def crop_section(filepath, section_index, output_dir=".", pyramid=1, segmenter="contour", use_cache=False, profiles=None):
+    img = load_image(filepath, use_cache)
+    if img is None:
+        return {"error": f"Could not open or find the image {filepath}"}
+    analysis = analyze_array(img, pyramid, segmenter, profiles=profiles)
         
     sections = analysis.get("sections", [])
     # 1-based indexing for CLI
@@ -97,32 +350,209 @@ def crop_section(filepath, section_index, output_dir="."):
         return {"error": f"Invalid section {section_index}. Found {len(sections)} sections."}
         
     s = sections[section_index - 1]
-    cropped = img[s['y']:s['y']+s['height'], s['x']:s['x']+s['width']]
-    
-    out_path = os.path.join(output_dir, f"section_{section_index}.png")
-    cv2.imwrite(out_path, cropped)
+    out_path = write_crop(img, s, section_index, output_dir)
     return {"status": "success", "file": out_path, "section": s}
 
+def crop_all_sections(filepath, output_dir=".", pyramid=1, segmenter="contour", use_cache=False, profiles=None,
+                      only=None):
+    # One decode and one analysis for every crop of the skeleton
+    img = load_image(filepath, use_cache)
+    if img is None:
+        return {"error": f"Could not open or find the image {filepath}"}
+    analysis = analyze_array(img, pyramid, segmenter, profiles=profiles)
+    
+    files = write_crops(img, analysis["sections"], output_dir, only)
+    return {"status": "success", "files": files, "sections": analysis["sections"]}
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    if os.uname().sysname == "Darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                return None
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+class VisionDaemon:
+    # Decoded images and blueprints stay in memory between requests. Keys
+    # include each file's mtime and size, so an edited skeleton or profiles
+    # file is picked up on the next request.
+    ACTIONS = ["analyze", "crop", "crop-all"]
+
+    def __init__(self, cache_size=4):
+        self.images = LRUCache(cache_size)
+        self.blueprints = LRUCache(cache_size * 8)
+
+    def image(self, filepath):
+        key = file_key(filepath)
+        if key is None:
+            return None, None
+        img = self.images.get(key)
+        if img is None:
+            img = load_image(filepath)
+            if img is None:
+                return None, None
+            self.images.put(key, img)
+        return key, img
+
+    def analysis(self, filepath, pyramid, segmenter, profiles):
+        key, img = self.image(filepath)
+        if img is None:
+            return None, None
+        blueprint_key = (key, pyramid, segmenter, file_key(profiles or PROFILES_FILE))
+        analysis = self.blueprints.get(blueprint_key)
+        if analysis is None:
+            analysis = analyze_array(img, pyramid, segmenter, profiles=profiles)
+            self.blueprints.put(blueprint_key, analysis)
+        return img, analysis
+
+    def handle(self, action, request):
+        if action not in self.ACTIONS:
+            return {"error": f"Unknown action {action}. Choose from {self.ACTIONS}"}
+        filepath = request.get("input")
+        if not filepath:
+            return {"error": "Missing input"}
+        img, analysis = self.analysis(filepath, int(request.get("pyramid", 1)),
+                                      request.get("segmenter", "contour"), request.get("profiles"))
+        if img is None:
+            return {"error": f"Could not open or find the image {filepath}"}
+
+        if action == "analyze":
+            return dict(analysis)
+        sections = analysis["sections"]
+        output_dir = request.get("outdir", ".")
+        if action == "crop":
+            section_index = int(request.get("section", 1))
+            if section_index < 1 or section_index > len(sections):
+                return {"error": f"Invalid section {section_index}. Found {len(sections)} sections."}
+            s = sections[section_index - 1]
+            return {"status": "success", "file": write_crop(img, s, section_index, output_dir), "section": s}
+        only = request.get("only")
+        files = write_crops(img, sections, output_dir, None if only is None else {int(i) for i in only})
+        return {"status": "success", "files": files, "sections": sections}
+
+    def stats(self):
+        return {"status": "ok", "images": len(self.images.items), "blueprints": len(self.blueprints.items),
+                "peak_rss_mb": peak_rss_mb()}
+
+def serve(host="127.0.0.1", port=DAEMON_PORT, cache_size=4):
+    # POST /analyze, /crop or /crop-all with the CLI options as a JSON body,
+    # e.g. {"input": "Skeleton.png", "section": 2}; GET /health for cache stats
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    daemon = VisionDaemon(cache_size)
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.reply(200, daemon.stats())
+            else:
+                self.reply(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            start = time.perf_counter()
+            status = 400
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if isinstance(request, dict):
+                    result = daemon.handle(self.path.strip("/"), request)
+                else:
+                    result = {"error": "Request body must be a JSON object"}
+            except (ValueError, TypeError, KeyError) as e:
+                result = {"error": str(e)}
+            except (OSError, cv2.error) as e:
+                # Unreadable/unwritable files or an OpenCV failure: still answer with JSON
+                status, result = 500, {"error": str(e)}
+            result["stats"] = {"elapsed_ms": round((time.perf_counter() - start) * 1000, 2)}
+            self.reply(status if "error" in result else 200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(json.dumps({"status": "serving", "url": f"http://{host}:{port}", "cache_size": cache_size}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Worker to analyze Skeleton images.")
     parser.add_argument("--analyze", action="store_true", help="Analyze the image and return JSON")
     parser.add_argument("--crop", action="store_true", help="Crop a specific section")
+    parser.add_argument("--crop-all", action="store_true", help="Crop every section in one pass")
     parser.add_argument("--input", type=str, help="Input image file")
     parser.add_argument("--section", type=int, default=1, help="Section index to crop (1-based)")
+    parser.add_argument("--only", type=int, nargs="+", help="With --crop-all, only write these sections (1-based)")
     parser.add_argument("--outdir", type=str, default=".", help="Output directory for cropped images")
+    parser.add_argument("--pyramid", type=int, default=1, help="Detect sections on an image downscaled by this factor (e.g. 4), then refine at full resolution")
+    parser.add_argument("--segmenter", choices=SEGMENTERS, default="contour", help="Section segmenter: external contours or recursive XY-cut on projection profiles")
+    parser.add_argument("--profiles", type=str, default=PROFILES_FILE, help="JSON list of colour classes ({type, lower, upper} in HSV); built-in defaults if missing")
+    parser.add_argument("--npy-cache", action="store_true", help=f"Cache the decoded image as .npy in {CACHE_DIR} and memory-map it on repeat runs")
+    parser.add_argument("--serve", action="store_true", help="Run as a daemon answering analyze/crop requests over localhost HTTP")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Daemon bind address")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT, help="Daemon port")
+    parser.add_argument("--cache-size", type=int, default=4, help="Decoded images the daemon keeps in memory (LRU)")
     
     args = parser.parse_args()
     
+    if args.serve:
+        serve(args.host, args.port, args.cache_size)
+        exit(0)
+
     if not args.input:
         print(json.dumps({"error": "Missing --input"}))
         exit(1)
         
     if args.analyze:
-        result = analyze_image(args.input)
+        timings = {}
+        result = analyze_image(args.input, args.pyramid, args.segmenter, args.npy_cache, timings, args.profiles)
+        result["stats"] = {"peak_rss_mb": peak_rss_mb(),
+                           "timings_ms": {k: round(v * 1000, 2) for k, v in timings.items()}}
         print(json.dumps(result, indent=2))
         
     elif args.crop:
-        result = crop_section(args.input, args.section, args.outdir)
+        result = crop_section(args.input, args.section, args.outdir, args.pyramid, args.segmenter, args.npy_cache,
+                              args.profiles)
+        result["stats"] = {"peak_rss_mb": peak_rss_mb()}
+        print(json.dumps(result, indent=2))
+    elif args.crop_all:
+        result = crop_all_sections(args.input, args.outdir, args.pyramid, args.segmenter, args.npy_cache,
+                                   args.profiles, None if args.only is None else set(args.only))
+        result["stats"] = {"peak_rss_mb": peak_rss_mb()}
         print(json.dumps(result, indent=2))
     else:
-        print(json.dumps({"error": "Must specify --analyze or --crop"}))
+        print(json.dumps({"error": "Must specify --analyze, --crop or --crop-all"}))
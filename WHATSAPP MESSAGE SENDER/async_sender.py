@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+Async WhatsApp Sender - asyncio engine with the WhatsAppSender API
+
+Same methods as WhatsAppSender (send_message, send_image, exit_chat,
+send_batch, check_replies, read_chat, ...), awaited instead of blocking:
+- Fixed time.sleep() pauses are replaced by awaited selectors and page state
+- Replies are pushed by the page (REPLY_OBSERVER_JS) and handled while any
+  other await is pending, including rate-limit waits
+- In send_batch the next chat is opened and its text prefilled during the
+  RateScheduler wait, so only the send click remains when the slot comes up
+- Message log writes run in a worker thread and never stall the page
+
+Usage:
+  python async_sender.py PHONE 'message'
+  python async_sender.py --image PHONE /path/img.jpg 'caption'
+  python async_sender.py --batch 'p1,p2,p3' 'message'
+  python async_sender.py --check-replies
+"""
+
+import asyncio
+import os
+import random
+from urllib.parse import quote
+from typing import Any, Dict, List, Optional, Tuple
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+
+from rate_scheduler import DAILY_CAP, RateScheduler
+from send_whatsapp_playwright import (
+    BATCH_DELAY, BATCH_SIZE, CHAT_STATE_JS, INVALID_NUMBER_TEXT, LOGIN_STATE_JS, MESSAGE_DELAY,
+    RATE_WARNING_TEXTS, READ_CHAT_JS, REPLY_OBSERVER_JS, SESSION_DIR, WhatsAppSender, export_messages_csv,
+    get_contact_index, get_message_store, log_sent_message, update_reply_for_message,
+)
+
+CHAT_LIST = '[data-testid="chat-list-search"]'
+# True once the compose box has been emptied by a successful send
+COMPOSE_EMPTY_JS = """
+() => {
+    const box = document.querySelector('footer div[contenteditable="true"]');
+    return !box || !box.innerText.trim();
+}
+"""
+
+
+class AsyncWhatsAppSender:
+    """asyncio counterpart of WhatsAppSender."""
+
+    # Pure helpers shared with the sync sender
+    _normalize_phone = WhatsAppSender._normalize_phone
+    _contact_key = WhatsAppSender._contact_key
+    track_contacts = WhatsAppSender.track_contacts
+    _on_incoming_event = WhatsAppSender._on_incoming_event
+
+    def __init__(self, headless: bool = False, session_dir: str = SESSION_DIR):
+        self.headless = headless
+        self.session_dir = session_dir
+        self.playwright: Optional[Any] = None
+        self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
+        self.page: Optional[Page] = None
+        self.is_logged_in = False
+        self.reply_events = False
+        self.tracked_contacts: Dict[str, str] = {}
+        self.captured_replies: List[Dict] = []
+        self._seen_event_ids: set = set()
+        self._pending_writes: List[asyncio.Future] = []
+        self.contacts = get_contact_index()
+        self.scheduler = RateScheduler.from_limits(
+            BATCH_SIZE, BATCH_DELAY, MESSAGE_DELAY, daily_cap=DAILY_CAP, name=os.path.basename(session_dir)
+        )
+
+    async def start(self) -> bool:
+        """Start browser with persistent session storage."""
+        os.makedirs(self.session_dir, exist_ok=True)
+        try:
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(
+                headless=self.headless,
+                args=['--disable-blink-features=AutomationControlled']
+            )
+            storage_state_path = f"{self.session_dir}/storage_state.json"
+            self.context = await self.browser.new_context(
+                storage_state=storage_state_path if os.path.exists(storage_state_path) else None,
+                viewport={'width': 1280, 'height': 800}
+            )
+            self.page = await self.context.new_page()
+
+            await self.page.goto("https://web.whatsapp.com")
+            try:
+                # Chat list or QR code, whichever shows first
+                state = await (await self.page.wait_for_function(LOGIN_STATE_JS, timeout=8000)).json_value()
+            except Exception:
+                state = None
+            if state == "chats":
+                print("✅ Session restored - already logged in!")
+            else:
+                print("⏳ Waiting for QR scan... (timeout: 120s)")
+                await self.page.wait_for_selector(CHAT_LIST, timeout=120000)
+                print("✅ QR code scanned!")
+                await self._save_session()
+            self.is_logged_in = True
+            return True
+        except Exception as e:
+            print(f"❌ Error starting browser: {e}")
+            return False
+
+    async def _save_session(self):
+        if self.context is None:
+            return
+        try:
+            await self.context.storage_state(path=f"{self.session_dir}/storage_state.json")
+            print("💾 Session saved for next time")
+        except Exception as e:
+            print(f"⚠️ Could not save session: {e}")
+
+    async def stop(self):
+        """Flush log writes, save the session and close the browser."""
+        await self._flush_writes()
+        if self.is_logged_in:
+            await self._save_session()
+        await asyncio.to_thread(export_messages_csv)
+        self.contacts.save()
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def _log(self, contact: str, message: str, message_type: str = "text"):
+        """Write to the message store in a worker thread; flushed by _flush_writes()."""
+        self._pending_writes.append(asyncio.ensure_future(
+            asyncio.to_thread(log_sent_message, contact, message, message_type)))
+
+    async def _flush_writes(self):
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+            self._pending_writes = []
+
+    async def _get_contact_name(self, phone: str, auto_detect: bool = False) -> str:
+        name = self.contacts.name(phone)
+        if name:
+            return name
+        if auto_detect and self.page is not None:
+            try:
+                header = self.page.locator('header span[title], [data-testid="conversation-header-title"]').first
+                name = await header.inner_text(timeout=2000)
+                if name:
+                    self.contacts.record(phone, name=name)
+                    return name
+            except Exception:
+                pass
+        # Same fallback key as earlier message logs, not the E.164 form
+        return "+" + ''.join(c for c in phone if c.isdigit())
+
+    async def _wait_for_chat_load(self, timeout: int = 15) -> bool:
+        """Wait for any compose box selector at once (not one after another)."""
+        return await self._wait_for_chat_state(timeout) == "chat"
+
+    async def _wait_for_chat_state(self, timeout: int = 15) -> Optional[str]:
+        """"chat", "invalid" (not on WhatsApp, detected as soon as the popup shows) or None."""
+        try:
+            handle = await self.page.wait_for_function(CHAT_STATE_JS, timeout=timeout * 1000)
+            return await handle.json_value()
+        except Exception:
+            return None
+
+    async def _open_chat(self, phone: str, message: str = "") -> bool:
+        """Navigate to a chat, with the message prefilled, and wait until it can be sent."""
+        full_phone = self._normalize_phone(phone)
+        if self.contacts.is_invalid(phone):
+            print(f"⏭️ {full_phone} is not on WhatsApp (contact index) - skipped")
+            return False
+        url = f"https://web.whatsapp.com/send?phone={full_phone}"
+        if message:
+            url += "&text=" + quote(message)
+        print(f"📱 Opening chat for {full_phone}...")
+        try:
+            await self.page.goto(url)
+        except Exception as e:
+            print(f"❌ Could not open chat for {full_phone}: {e}")
+            return False
+        state = await self._wait_for_chat_state(timeout=15)
+        if state == "invalid":
+            print(f"❌ {full_phone} is not on WhatsApp")
+            self.contacts.record(phone, status="invalid")
+            return False
+        if state != "chat":
+            print(f"❌ Chat did not load for {full_phone}")
+            return False
+        self.contacts.record(phone, status="ok")
+        return True
+
+    async def _click_send(self) -> bool:
+        """Click send, then wait for the compose box to empty instead of sleeping."""
+        page = self.page
+        strategies = [
+            lambda: page.locator('[data-testid="send"]').click(timeout=3000),
+            lambda: page.locator('button[aria-label*="Send"]').click(timeout=3000),
+            lambda: page.keyboard.press("Enter"),
+            lambda: page.locator('span[data-icon="send"]').click(timeout=3000),
+        ]
+        for i, strategy in enumerate(strategies):
+            try:
+                await strategy()
+                await page.wait_for_function(COMPOSE_EMPTY_JS, timeout=5000)
+                return True
+            except Exception as e:
+                if i == len(strategies) - 1:
+                    print(f"❌ Could not send: {e}")
+        return False
+
+    async def _send_open_chat(self, phone: str, message: str, auto_name: bool = False) -> Tuple[bool, str]:
+        contact_name = await self._get_contact_name(phone, auto_detect=auto_name)
+        if not await self._click_send():
+            return False, contact_name
+        print(f"✅ Sent to {contact_name}: {message[:50]}...")
+        self._log(contact_name, message, "text")
+        return True, contact_name
+
+    async def send_message(self, phone: str, message: str, auto_name: bool = False) -> Tuple[bool, str]:
+        """Send text message to phone number. Returns (success, contact_name)."""
+        if self.page is None or not self.is_logged_in:
+            print("❌ Not logged in!")
+            return False, phone
+        if not await self._open_chat(phone, message):
+            return False, phone
+        return await self._send_open_chat(phone, message, auto_name)
+
+    async def exit_chat(self) -> bool:
+        """Exit current chat and go back to chat list."""
+        page = self.page
+        if page is None:
+            return False
+        back = page.locator(', '.join([
+            'button[aria-label*="Back"]', 'button[title="Back"]', '[data-testid="btn-back"]',
+            'button[data-testid="back"]',
+        ])).first
+        try:
+            await back.click(timeout=2000)
+            await page.wait_for_selector('#main', state="detached", timeout=3000)
+            print("✅ Exited chat to list")
+            return True
+        except Exception:
+            pass
+        try:
+            await page.goto("https://web.whatsapp.com/")
+            await page.wait_for_selector(CHAT_LIST, timeout=10000)
+            print("✅ Navigated back to chat list")
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not exit chat: {e}")
+            return False
+
+    async def send_message_and_exit(self, phone: str, message: str, auto_name: bool = False) -> Tuple[bool, str]:
+        success, name = await self.send_message(phone, message, auto_name)
+        if success:
+            await self.exit_chat()
+        return success, name
+
+    async def send_image(self, phone: str, image_path: str, caption: str = "") -> Tuple[bool, str]:
+        """Send image as photo (NOT sticker) with optional caption."""
+        page = self.page
+        if page is None or not self.is_logged_in:
+            print("❌ Not logged in!")
+            return False, phone
+        if not os.path.exists(image_path):
+            print(f"❌ Image not found: {image_path}")
+            return False, phone
+        if not await self._open_chat(phone):
+            return False, phone
+        contact_name = await self._get_contact_name(phone, auto_detect=True)
+
+        try:
+            print("📎 Clicking attachment button...")
+            await page.locator(', '.join([
+                '[data-testid="conversation-attachment-button"]', 'button[title*="Attach"]',
+                'button[aria-label*="Attach"]', '[data-icon="attach-menu-plus"]',
+            ])).first.click(timeout=5000)
+
+            print("🖼️ Clicking Photos & videos...")
+            # The menu item itself is the signal that the menu opened
+            await page.locator(':text("Photos & videos"), button:has-text("Photos")').first.click(timeout=5000)
+
+            print(f"📤 Uploading {os.path.basename(image_path)}...")
+            await page.locator('input[type="file"]').first.set_input_files(image_path)
+            send_button = page.locator(', '.join([
+                '[data-testid="send"]', 'div[role="button"]:has(span[data-icon="send"])', 'button:has-text("Send")',
+            ])).first
+            # Preview is ready once its send button shows up
+            await send_button.wait_for(timeout=15000)
+
+            if caption:
+                print(f"📝 Adding caption...")
+                try:
+                    await page.locator('[data-testid="caption-input"], div[contenteditable="true"][data-tab="1"]'
+                                       ).first.fill(caption, timeout=3000)
+                except Exception:
+                    pass  # Caption not critical
+
+            print("📨 Sending image...")
+            await send_button.click()
+            await send_button.wait_for(state="detached", timeout=15000)
+        except Exception as e:
+            print(f"❌ Error sending image: {e}")
+            return False, contact_name
+
+        print(f"✅ Image sent to {contact_name}")
+        self._log(contact_name, f"{os.path.basename(image_path)} | {caption}", "image")
+        return True, contact_name
+
+    async def send_image_and_exit(self, phone: str, image_path: str, caption: str = "") -> Tuple[bool, str]:
+        success, name = await self.send_image(phone, image_path, caption)
+        if success:
+            await self.exit_chat()
+        return success, name
+
+    async def read_chat(self) -> Dict:
+        """Read the open chat in a single evaluate() call (see WhatsAppSender.read_chat)."""
+        empty = {"contact": "", "messages": [], "last_outgoing": -1, "replies": []}
+        if self.page is None:
+            return empty
+        try:
+            return await self.page.evaluate(READ_CHAT_JS)
+        except Exception:
+            return empty
+
+    async def enable_reply_events(self, contacts: Optional[List[str]] = None) -> bool:
+        """Have the page push incoming messages (see WhatsAppSender.enable_reply_events)."""
+        if self.page is None or self.context is None:
+            return False
+        if contacts is None:
+            contacts = await asyncio.to_thread(lambda: get_message_store().contacts())
+        self.track_contacts(contacts)
+        if self.reply_events:
+            return True
+        try:
+            await self.context.expose_binding("__waOnIncoming", self._on_incoming_event)
+            await self.context.add_init_script(REPLY_OBSERVER_JS)
+            await self.page.evaluate(REPLY_OBSERVER_JS)
+            self.reply_events = True
+            print(f"👂 Listening for replies from {len(self.tracked_contacts)} contacts")
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not enable reply events: {e}")
+            return False
+
+    async def wait_for_replies(self, duration: float) -> List[Dict]:
+        """Sleep while pushed replies are recorded. Returns those captured."""
+        start = len(self.captured_replies)
+        await asyncio.sleep(duration)
+        return self.captured_replies[start:]
+
+    async def _acquire(self) -> bool:
+        """RateScheduler.acquire, listening for replies while waiting. False at the daily cap."""
+        scheduler = self.scheduler
+        while True:
+            wait = scheduler.try_take()
+            if wait is None:
+                return False
+            if wait <= 0:
+                return True
+            if wait >= 10:
+                print(f"⏳ Next send slot in {wait:.0f}s... (listening for replies)")
+            await self.wait_for_replies(wait * (1 + random.uniform(0, scheduler.jitter)))
+
+    async def _record_failure(self, phone: str):
+        """Tell the scheduler about a failed send; invalid numbers don't slow us down."""
+        if self.contacts.is_invalid(phone):
+            return
+        text = ""
+        try:
+            popup = self.page.locator('div[role="dialog"], [data-animate-modal-popup="true"]').first
+            if await popup.count():
+                text = (await popup.inner_text(timeout=1000)).lower()
+        except Exception:
+            pass
+        if INVALID_NUMBER_TEXT in text:
+            print("⚠️ Number is not on WhatsApp")
+            return
+        self.scheduler.record_failure(warning=any(warning in text for warning in RATE_WARNING_TEXTS))
+
+    async def send_batch(self, phones: List[str], message: str) -> Dict:
+        """
+        Send messages to multiple contacts, paced by self.scheduler.
+        Each wait for a send slot overlaps with opening the next chat, and
+        replies are captured from page events throughout.
+        """
+        results = {"success": [], "failed": [], "deferred": [], "invalid": []}
+        if self.page is None or not self.is_logged_in:
+            print("❌ Not logged in!")
+            results["failed"] = list(phones)
+            return results
+        await self.enable_reply_events()
+
+        # Known-bad numbers are dropped before any browser work
+        phones, results["invalid"] = self.contacts.preflight(phones)
+        if results["invalid"]:
+            print(f"⏭️ Skipping {len(results['invalid'])} numbers not on WhatsApp: {results['invalid']}")
+
+        opened = await self._open_chat(phones[0], message) if phones else False
+        for i, phone in enumerate(phones):
+            print(f"\n[{i+1}/{len(phones)}] {phone}")
+            if not opened:
+                # A chat that never opened takes no send slot
+                if self.contacts.is_invalid(phone):
+                    results["invalid"].append(phone)
+                else:
+                    results["failed"].append(phone)
+                    await self._record_failure(phone)
+            elif not await self._acquire():
+                print(f"🛑 Daily cap of {self.scheduler.daily_cap} reached - {len(phones) - i} contacts deferred")
+                results["deferred"] = list(phones[i:])
+                break
+            else:
+                success, name = await self._send_open_chat(phone, message, auto_name=True)
+                if success:
+                    results["success"].append({"phone": phone, "name": name})
+                    self.track_contacts([name])
+                    self.scheduler.record_success()
+                else:
+                    results["failed"].append(phone)
+                    await self._record_failure(phone)
+
+            # The next chat loads while we wait for its send slot
+            if i < len(phones) - 1:
+                opened = await self._open_chat(phones[i + 1], message)
+
+        if results["success"]:
+            print(f"\n🔍 Final reply check...")
+            await self.wait_for_replies(15)
+        await self._flush_writes()
+
+        print(f"\n{'='*60}")
+        print(f"✅ Success: {len(results['success'])}/{len(phones)}")
+        if results["failed"]:
+            print(f"❌ Failed: {results['failed']}")
+        if results["deferred"]:
+            print(f"⏸️ Deferred to tomorrow: {results['deferred']}")
+        if self.captured_replies:
+            print(f"📩 Replies captured: {len(self.captured_replies)}")
+        return results
+
+    async def check_replies(self) -> List[Dict]:
+        """Open unread chats and record the replies after our last message."""
+        page = self.page
+        if page is None:
+            return []
+        new_replies = []
+        rows = await page.locator('[data-testid="chat-list"] > div > div').all()
+        print(f"🔍 Checking {len(rows)} chats...")
+        for row in rows[:20]:
+            try:
+                unread = row.locator('span[class*="message"], span[class*="unread"], div[class*="unread"]')
+                if await unread.count() == 0:
+                    continue
+                await row.click()
+                await page.wait_for_selector('#main [data-testid="msg-container"], #main div[data-id]', timeout=5000)
+                chat = await self.read_chat()
+                if chat["replies"]:
+                    contact = chat["contact"] or "Unknown"
+                    combined = " + ".join(chat["replies"])
+                    if await asyncio.to_thread(update_reply_for_message, contact, combined):
+                        print(f"📩 {contact}: {combined[:60]}...")
+                        new_replies.append({"contact": contact, "message": combined})
+            except Exception:
+                continue
+        print(f"✅ Found {len(new_replies)} new replies")
+        return new_replies
+
+
+async def run(argv: List[str]):
+    flags = [a for a in argv if a.startswith('--')]
+    args = [a for a in argv if not a.startswith('--')]
+    async with AsyncWhatsAppSender(headless=False) as sender:
+        if not sender.is_logged_in:
+            print("❌ Failed to login")
+            return
+        if '--batch' in flags:
+            phones = [p.strip() for p in args[0].split(',')]
+            await sender.send_batch(phones, args[1] if len(args) > 1 else "Hello!")
+        elif '--image' in flags:
+            await sender.send_image(args[0], args[1], args[2] if len(args) > 2 else "")
+        elif '--check-replies' in flags:
+            await sender.check_replies()
+        else:
+            await sender.send_message(args[0], args[1] if len(args) > 1 else "Hello!",
+                                      auto_name='--auto-name' in flags)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+    else:
+        asyncio.run(run(sys.argv[1:]))
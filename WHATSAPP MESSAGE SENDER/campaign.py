@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Campaign Runner - resumable sends from an input_contacts.csv
+
+Reads the Node project's CSV format (phone,message[,image_path,caption]) one
+row at a time and records every contact's status in SQLite as soon as it is
+known, so a crashed or interrupted campaign picks up where it stopped:
+- sent / skipped rows are never sent again
+- rows are identified by phone number and message, not position, so the
+  CSV can be edited, re-sorted or extended between runs
+- failed rows and rows left over at the daily cap are retried on the next run
+- a row that was being sent when the process died is marked "unconfirmed"
+  and skipped rather than risking a double send
+- numbers that already got the same content today (in any campaign, or in
+  the message log) are skipped
+- numbers the contact index knows are not on WhatsApp are marked "invalid"
+  without opening a chat
+
+Usage:
+  python campaign.py input_contacts.csv                 (start or resume)
+  python campaign.py input_contacts.csv --name diwali   (campaign name, default: file name)
+  python campaign.py --status diwali
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+from contact_index import normalize_phone
+from send_whatsapp_playwright import WhatsAppSender, get_message_store
+
+CAMPAIGN_DB = "/home/zazikant/whatsapp_campaigns.db"
+
+# Statuses that end a contact's part in a campaign
+DONE_STATUSES = ("sent", "skipped", "unconfirmed")
+
+# A contact's entry is keyed on its number and message, not its CSV row, so
+# editing or re-sorting the CSV between runs cannot mix up who got what
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS campaign_contacts (
+        campaign TEXT NOT NULL,
+        row INTEGER NOT NULL,
+        phone TEXT NOT NULL,
+        phone_key TEXT NOT NULL,
+        content TEXT NOT NULL,
+        content_hash TEXT NOT NULL,
+        status TEXT NOT NULL,
+        contact TEXT NOT NULL DEFAULT '',
+        day TEXT NOT NULL,
+        updated TEXT NOT NULL,
+        PRIMARY KEY (campaign, phone_key, content_hash)
+    )
+"""
+
+
+def phone_key(phone: str) -> str:
+    """Last 10 digits, the same key the contact index uses."""
+    return normalize_phone(phone)[1]
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def row_content(entry: Dict[str, str]) -> str:
+    """What the message log records for this row."""
+    image_path = (entry.get("image_path") or "").strip()
+    if image_path:
+        return f"Image: {os.path.basename(image_path)} | {(entry.get('caption') or '').strip()}"
+    return entry["message"]
+
+
+def read_contacts(csv_path: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Stream (row number, entry) for rows with a phone and a message or image."""
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        for row, entry in enumerate(csv.DictReader(f), start=1):
+            if (entry.get("phone") or "").strip() and (entry.get("message") or entry.get("image_path")):
+                yield row, entry
+
+
+class CampaignStore:
+    """Per-contact campaign status, one committed transaction per change."""
+
+    def __init__(self, db_path: str = CAMPAIGN_DB):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        with self.conn:
+            self.conn.execute(SCHEMA)
+            self._migrate()
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_phone_day ON campaign_contacts (phone_key, day)"
+            )
+
+    def _migrate(self):
+        """Re-key tables from before content_hash existed (keyed on row number)."""
+        columns = [c[1] for c in self.conn.execute("PRAGMA table_info(campaign_contacts)")]
+        if "content_hash" in columns:
+            return
+        self.conn.create_function("content_hash", 1, content_hash)
+        self.conn.execute("ALTER TABLE campaign_contacts RENAME TO campaign_contacts_by_row")
+        self.conn.execute("DROP INDEX IF EXISTS idx_phone_day")
+        self.conn.execute(SCHEMA)
+        # Latest update wins where one contact got the same content on several rows
+        self.conn.execute(
+            "INSERT OR REPLACE INTO campaign_contacts "
+            "SELECT campaign, row, phone, phone_key, content, content_hash(content), status, contact, day, updated "
+            "FROM campaign_contacts_by_row ORDER BY updated"
+        )
+        self.conn.execute("DROP TABLE campaign_contacts_by_row")
+        print("🔄 Campaign database re-keyed on phone number and message")
+
+    def status(self, campaign: str, phone: str, content: str) -> Optional[str]:
+        """Status of this number with this message in the campaign, whatever its row."""
+        with self.lock:
+            found = self.conn.execute(
+                "SELECT status FROM campaign_contacts WHERE campaign = ? AND phone_key = ? AND content_hash = ?",
+                (campaign, phone_key(phone), content_hash(content)),
+            ).fetchone()
+        return found[0] if found else None
+
+    def record(self, campaign: str, row: int, phone: str, content: str, status: str, contact: str = ""):
+        now = datetime.now()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO campaign_contacts "
+                "(campaign, row, phone, phone_key, content, content_hash, status, contact, day, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (campaign, row, phone, phone_key(phone), content, content_hash(content), status, contact,
+                 now.strftime("%Y-%m-%d"), now.strftime("%Y-%m-%d %H:%M:%S")),
+            )
+
+    def sent_today(self, phone: str, content: str) -> bool:
+        """Did any campaign send this content to this number today?"""
+        with self.lock:
+            found = self.conn.execute(
+                "SELECT 1 FROM campaign_contacts WHERE phone_key = ? AND day = ? AND content = ? "
+                "AND status = 'sent' LIMIT 1",
+                (phone_key(phone), datetime.now().strftime("%Y-%m-%d"), content),
+            ).fetchone()
+        return found is not None
+
+    def summary(self, campaign: str) -> Dict[str, int]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM campaign_contacts WHERE campaign = ? GROUP BY status", (campaign,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class Campaign:
+    """Send an input_contacts.csv through a logged-in WhatsAppSender, resumably."""
+
+    def __init__(self, csv_path: str, name: Optional[str] = None, store: Optional[CampaignStore] = None):
+        self.csv_path = csv_path
+        self.name = name or os.path.splitext(os.path.basename(csv_path))[0]
+        self.store = store or CampaignStore()
+
+    def _already_logged(self, sender: WhatsAppSender, phone: str, content: str) -> bool:
+        """Same content in today's message log for this contact."""
+        sent = get_message_store().sent_today(sender._get_contact_name(phone))
+        return all(part in sent for part in content.split(" + "))
+
+    def run(self, sender: WhatsAppSender) -> Dict[str, int]:
+        """Send every contact not done yet. Returns this run's counts."""
+        store, scheduler = self.store, sender.scheduler
+        counts = {"sent": 0, "failed": 0, "skipped": 0, "invalid": 0, "unconfirmed": 0, "resumed": 0, "pending": 0}
+        print(f"🚀 Campaign '{self.name}' from {self.csv_path}")
+
+        contacts = read_contacts(self.csv_path)
+        for row, entry in contacts:
+            phone = entry["phone"].strip()
+            content = row_content(entry)
+            status = store.status(self.name, phone, content)
+
+            if status in DONE_STATUSES:
+                counts["resumed"] += 1
+                continue
+            if status == "sending":
+                # Died mid-send last time - WhatsApp may already have it
+                print(f"⚠️ Row {row} ({phone}) was being sent when the last run stopped - not resending")
+                store.record(self.name, row, phone, content, "unconfirmed")
+                counts["unconfirmed"] += 1
+                continue
+            if sender.contacts.is_invalid(phone):
+                print(f"⏭️ Row {row} ({phone}) is not on WhatsApp - skipped")
+                store.record(self.name, row, phone, content, "invalid")
+                counts["invalid"] += 1
+                continue
+            if store.sent_today(phone, content) or self._already_logged(sender, phone, content):
+                print(f"⏭️ Row {row} ({phone}) already got this message today - skipped")
+                store.record(self.name, row, phone, content, "skipped")
+                counts["skipped"] += 1
+                continue
+
+            print(f"\n[{self.name} #{row}] {phone}")
+            print("  🔍 Checking for pending replies...")
+            sender._check_and_capture_unread_replies(phone)
+            # The chat opens before a send slot is taken, so a bad number or a
+            # missing image neither spends quota nor backs off the campaign
+            outcome, contact = sender.send_paced(
+                phone, entry.get("message") or "", (entry.get("image_path") or "").strip(),
+                (entry.get("caption") or "").strip(),
+                on_slot=lambda: store.record(self.name, row, phone, content, "sending"))
+
+            if outcome == "deferred":
+                # This row and the rest stay pending for the next run
+                counts["pending"] = 1 + sum(
+                    1 for _, rest in contacts
+                    if store.status(self.name, rest["phone"].strip(), row_content(rest)) not in DONE_STATUSES
+                )
+                print(f"🛑 Daily cap of {scheduler.daily_cap} reached - resume tomorrow")
+                break
+            if outcome == "sent":
+                store.record(self.name, row, phone, content, "sent", contact)
+                counts["sent"] += 1
+            elif outcome == "invalid":
+                store.record(self.name, row, phone, content, "invalid")
+                counts["invalid"] += 1
+            else:
+                store.record(self.name, row, phone, content, "failed", contact)
+                counts["failed"] += 1
+
+        print(f"\n{'='*60}")
+        print(f"✅ Sent: {counts['sent']}  ❌ Failed: {counts['failed']}  ⏭️ Skipped: {counts['skipped']}"
+              f"  🚫 Invalid: {counts['invalid']}  ↩️ Already done: {counts['resumed']}  ⏸️ Pending: {counts['pending']}")
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send (or resume) a campaign from an input_contacts.csv.")
+    parser.add_argument("csv_path", nargs="?", help="CSV with phone,message[,image_path,caption] columns")
+    parser.add_argument("--name", type=str, help="Campaign name (default: CSV file name)")
+    parser.add_argument("--status", type=str, metavar="NAME", help="Print a campaign's status counts and exit")
+    parser.add_argument("--watch-replies", action="store_true", help="Capture replies through page events while waiting")
+    parser.add_argument("--headless", action="store_true", help="Run Chromium headless (must already be logged in)")
+    args = parser.parse_args()
+
+    if args.status:
+        print(CampaignStore().summary(args.status))
+        return
+    if not args.csv_path:
+        parser.error("csv_path is required")
+
+    campaign = Campaign(args.csv_path, args.name)
+    with WhatsAppSender(headless=args.headless) as sender:
+        if not sender.is_logged_in:
+            print("❌ Failed to login")
+            return
+        if args.watch_replies:
+            sender.enable_reply_events()
+        campaign.run(sender)
+    print(campaign.store.summary(campaign.name))
+
+
+if __name__ == "__main__":
+    main()
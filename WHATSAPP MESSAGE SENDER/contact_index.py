@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Contact Index - persistent phone number index for the WhatsApp senders
+
+A superset of the hard-coded CONTACT_CACHE, kept in contact_index.json:
+- E.164 number and resolved contact name per number (key: last 10 digits)
+- Last known status: "ok" (chat opened) or "invalid" (not on WhatsApp)
+- When the number was last checked and last changed
+
+It is loaded once at startup and filled in as chats are opened, so
+campaigns can drop known-bad numbers before any browser work instead of
+waiting for a chat that never loads.
+"""
+
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CONTACT_INDEX = "/home/zazikant/contact_index.json"
+DEFAULT_COUNTRY_CODE = "91"
+INVALID_TTL_DAYS = 30  # "not on WhatsApp" is re-checked after this long
+
+
+@lru_cache(maxsize=4096)
+def normalize_phone(phone: str) -> Tuple[str, str]:
+    """(E.164 number, last-10-digit key). Numbers without a country code are Indian."""
+    cleaned = re.sub(r'[\s\-+]', '', phone)
+    e164 = f"+{cleaned}" if len(cleaned) > 10 else f"+{DEFAULT_COUNTRY_CODE}{cleaned}"
+    return e164, cleaned[-10:]
+
+
+class ContactIndex:
+    """Phone number -> {e164, name, status, checked, updated}."""
+
+    def __init__(self, path: Optional[str] = CONTACT_INDEX, seed: Optional[Dict[str, str]] = None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (ValueError, OSError) as e:
+                print(f"⚠️ Could not read contact index: {e}")
+        # Hard-coded names fill in numbers the index hasn't named yet
+        for key, name in (seed or {}).items():
+            entry = self.entries.setdefault(key, {"e164": normalize_phone(key)[0]})
+            entry.setdefault("name", name)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, phone: str) -> Optional[Dict]:
+        return self.entries.get(normalize_phone(phone)[1])
+
+    def name(self, phone: str) -> Optional[str]:
+        entry = self.get(phone)
+        return entry.get("name") if entry else None
+
+    def is_invalid(self, phone: str) -> bool:
+        """Known not to be on WhatsApp, as of less than INVALID_TTL_DAYS ago."""
+        entry = self.get(phone)
+        if not entry or entry.get("status") != "invalid":
+            return False
+        checked = datetime.strptime(entry["checked"], "%Y-%m-%d %H:%M:%S")
+        return datetime.now() - checked < timedelta(days=INVALID_TTL_DAYS)
+
+    def record(self, phone: str, name: Optional[str] = None, status: Optional[str] = None):
+        """Update a number after a chat was opened (status) or named (name)."""
+        e164, key = normalize_phone(phone)
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            changed = key not in self.entries
+            entry = self.entries.setdefault(key, {"e164": e164})
+            if entry.get("e164") != e164:
+                entry["e164"] = e164
+                changed = True
+            if name and entry.get("name") != name:
+                entry["name"] = name
+                changed = True
+            if status:
+                changed = changed or entry.get("status") != status
+                entry["status"] = status
+                entry["checked"] = now
+                self.dirty = True
+            if changed:
+                entry["updated"] = now
+                self.dirty = True
+        # A new name or status is saved right away; a re-check waits for the next save
+        if changed:
+            self.save()
+
+    def preflight(self, phones: Iterable[str]) -> Tuple[List[str], List[str]]:
+        """Split a list into (numbers to try, numbers known not to be on WhatsApp)."""
+        usable, invalid = [], []
+        for phone in phones:
+            (invalid if self.is_invalid(phone) else usable).append(phone)
+        return usable, invalid
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
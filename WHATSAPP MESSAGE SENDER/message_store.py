@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Message Store - SQLite log of sent messages and replies
+
+Replaces the read-everything / rewrite-everything CSV updates of
+send_whatsapp_playwright.py:
+- Logging a message is one indexed lookup plus an INSERT or UPDATE
+- Capturing a reply updates only the latest row for that contact
+- whatsapp_messages.csv is an export view, written on demand
+
+Rows keep the CSV semantics: messages to the same contact on the same day are
+joined with " + " while that contact is the latest row, and replies are joined
+with " + " until a new message is sent.
+"""
+
+import csv
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+CSV_FIELDS = ["timestamp", "contact", "sent_message", "reply"]
+
+
+class MessageStore:
+    """Transactional message log with an index by contact and day."""
+
+    def __init__(self, db_path: str, import_csv: Optional[str] = None):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    contact TEXT NOT NULL,
+                    sent_message TEXT NOT NULL DEFAULT '',
+                    reply TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_contact_day ON messages (contact, day)")
+
+        # One-time migration of an existing CSV log
+        if import_csv and os.path.exists(import_csv) and self.count() == 0:
+            imported = self.import_csv(import_csv)
+            print(f"📥 Imported {imported} rows from {import_csv}")
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def log_sent(self, contact: str, display_msg: str, timestamp: Optional[str] = None) -> int:
+        """Log a sent message. Returns the id of the row it landed in."""
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        day = timestamp[:10]
+        contact = contact.strip()
+
+        with self.lock, self.conn:
+            last = self.conn.execute(
+                "SELECT id, day, contact, sent_message FROM messages ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+
+            # Same contact and same day as the latest row - concatenate messages
+            if last and last[2] == contact and last[1] == day:
+                sent = last[3] + " + " + display_msg if last[3] else display_msg
+                # The reply is cleared since it's now linked to the concatenated message
+                self.conn.execute(
+                    "UPDATE messages SET sent_message = ?, timestamp = ?, reply = '' WHERE id = ?",
+                    (sent, timestamp, last[0]),
+                )
+                return last[0]
+
+            cursor = self.conn.execute(
+                "INSERT INTO messages (timestamp, day, contact, sent_message, reply) VALUES (?, ?, ?, ?, '')",
+                (timestamp, day, contact, display_msg),
+            )
+            return cursor.lastrowid
+
+    def update_reply(self, contact: str, reply_text: str) -> bool:
+        """Attach a reply to the most recent message to this contact."""
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT id, reply FROM messages WHERE contact = ? ORDER BY id DESC LIMIT 1",
+                (contact.strip(),),
+            ).fetchone()
+            if row is None:
+                return False
+            current = row[1].strip()
+            reply = current + " + " + reply_text if current else reply_text
+            self.conn.execute("UPDATE messages SET reply = ? WHERE id = ?", (reply, row[0]))
+            return True
+
+    def sent_today(self, contact: str, day: Optional[str] = None) -> List[str]:
+        """Messages sent to a contact on a day (default: today), split on ' + '."""
+        day = day or datetime.now().strftime("%Y-%m-%d")
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT sent_message FROM messages WHERE contact = ? AND day = ?", (contact.strip(), day)
+            ).fetchall()
+        return [part for (sent,) in rows for part in sent.split(" + ") if part]
+
+    def contacts(self) -> List[str]:
+        """Every contact we've sent messages to."""
+        with self.lock:
+            return [r[0] for r in self.conn.execute("SELECT DISTINCT contact FROM messages ORDER BY contact")]
+
+    def rows(self) -> List[Dict[str, str]]:
+        with self.lock:
+            cursor = self.conn.execute(
+                "SELECT timestamp, contact, sent_message, reply FROM messages ORDER BY id"
+            )
+            return [dict(zip(CSV_FIELDS, r)) for r in cursor]
+
+    def import_csv(self, csv_path: str) -> int:
+        """Load rows from an existing whatsapp_messages.csv."""
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            rows = [
+                (r.get("timestamp", ""), r.get("timestamp", "")[:10], r.get("contact", "").strip(),
+                 r.get("sent_message", ""), r.get("reply", ""))
+                for r in csv.DictReader(f)
+            ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO messages (timestamp, day, contact, sent_message, reply) VALUES (?, ?, ?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def export_csv(self, csv_path: str) -> int:
+        """Write the CSV view atomically. Returns the number of rows."""
+        rows = self.rows()
+        tmp_path = csv_path + ".tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, csv_path)
+        return len(rows)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
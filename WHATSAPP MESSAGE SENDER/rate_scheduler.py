@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Rate Scheduler - token bucket pacing for WhatsApp sends
+
+Replaces the fixed MESSAGE_DELAY / BATCH_DELAY sleeps:
+- Burst: up to `burst` messages may go out back to back (min_interval apart)
+- Refill: tokens come back at `refill_per_sec`, so short lists never wait
+  for a full batch delay
+- Daily cap: at most `daily_cap` sends per account per calendar day
+- Jitter: every wait is stretched by a random fraction so sends are not
+  evenly spaced
+- Backoff: failures and warnings pause sending, doubling per consecutive
+  failure; a success clears it
+- State (tokens, today's count, backoff) is saved after every change, so a
+  restarted campaign continues with the budget it had
+- The state file is shared by every account and process (CLI, pool, daemon):
+  each change re-reads it and writes it back under a file lock, so
+  concurrent senders neither overwrite each other nor overspend an account
+"""
+
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking, one sender process at a time
+    fcntl = None
+
+SCHEDULER_STATE = "/home/zazikant/rate_state.json"
+DAILY_CAP = 200
+BACKOFF_BASE = 30      # seconds after the first failure
+BACKOFF_MAX = 15 * 60  # seconds
+
+
+class RateScheduler:
+    """Token bucket with a daily cap, jitter and failure backoff."""
+
+    def __init__(self, burst: int = 5, refill_per_sec: float = 5 / 132, min_interval: float = 3,
+                 daily_cap: int = DAILY_CAP, jitter: float = 0.3, name: str = "default",
+                 state_path: Optional[str] = SCHEDULER_STATE):
+        self.burst = burst
+        self.refill_per_sec = refill_per_sec
+        self.min_interval = min_interval
+        self.daily_cap = daily_cap
+        self.jitter = jitter
+        self.name = name
+        self.state_path = state_path
+        self.state = self._load()
+
+    @classmethod
+    def from_limits(cls, batch_size: int, batch_delay: float, message_delay: float, **kwargs) -> "RateScheduler":
+        """Same long-run rate as the old pacing: batch_size messages per batch cycle."""
+        cycle = batch_delay + (batch_size - 1) * message_delay
+        return cls(burst=batch_size, refill_per_sec=batch_size / cycle, min_interval=message_delay, **kwargs)
+
+    def _read_all(self) -> Dict:
+        """Every account's saved state. Writes replace the file atomically, so no lock is needed to read."""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (ValueError, OSError):
+            return {}
+
+    def _load(self) -> Dict:
+        state = {"tokens": float(self.burst), "updated": time.time(), "last_sent": 0.0,
+                 "day": datetime.now().strftime("%Y-%m-%d"), "sent_today": 0,
+                 "failures": 0, "blocked_until": 0.0}
+        state.update(self._read_all().get(self.name, {}))
+        return state
+
+    def _reload(self):
+        """Pick up sends and failures another process saved for this account."""
+        self.state.update(self._read_all().get(self.name, {}))
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on the state file, held across a read-modify-write."""
+        if not self.state_path or fcntl is None:
+            yield
+            return
+        with open(self.state_path + ".lock", 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write(self):
+        """Merge this account's state into the file. Call with the lock held."""
+        if not self.state_path:
+            return
+        everything = self._read_all()
+        everything[self.name] = self.state
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(everything, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def save(self):
+        with self._locked():
+            self._write()
+
+    def _refill(self, now: float):
+        state = self.state
+        today = datetime.now().strftime("%Y-%m-%d")
+        if state["day"] != today:
+            state["day"] = today
+            state["sent_today"] = 0
+        elapsed = max(0.0, now - state["updated"])
+        state["tokens"] = min(float(self.burst), state["tokens"] + elapsed * self.refill_per_sec)
+        state["updated"] = now
+
+    @property
+    def remaining_today(self) -> int:
+        self._refill(time.time())
+        return max(0, self.daily_cap - self.state["sent_today"])
+
+    def wait_time(self) -> Optional[float]:
+        """Seconds until the next send is allowed; None once today's cap is used up."""
+        self._reload()
+        now = time.time()
+        self._refill(now)
+        state = self.state
+        if state["sent_today"] >= self.daily_cap:
+            return None
+        waits = [
+            state["blocked_until"] - now,
+            state["last_sent"] + self.min_interval - now,
+            (1 - state["tokens"]) / self.refill_per_sec if state["tokens"] < 1 else 0.0,
+        ]
+        wait = max(waits)
+        # Float leftovers of a refill are not worth another round of waiting
+        return wait if wait > 0.01 else 0.0
+
+    def _take(self):
+        now = time.time()
+        self._refill(now)
+        self.state["tokens"] = max(0.0, self.state["tokens"] - 1)
+        self.state["last_sent"] = now
+        self.state["sent_today"] += 1
+        self._write()
+
+    def take(self):
+        """Consume a token for a send happening now."""
+        with self._locked():
+            self._reload()
+            self._take()
+
+    def try_take(self) -> Optional[float]:
+        """
+        Consume a token if a send is allowed now, checked and taken under one
+        lock. Returns 0 if taken, else the seconds to wait (None at the daily cap).
+        """
+        with self._locked():
+            wait = self.wait_time()
+            if wait == 0:
+                self._take()
+        return wait
+
+    def acquire(self, idle: Callable[[float], None] = time.sleep) -> bool:
+        """
+        Block until a send is allowed, handing every wait to `idle` (e.g. reply
+        capture). Returns False if today's cap is reached.
+        """
+        while True:
+            wait = self.try_take()
+            if wait is None:
+                return False
+            if wait <= 0:
+                return True
+            idle(wait * (1 + random.uniform(0, self.jitter)))
+
+    def record_success(self):
+        if self.state["failures"]:
+            with self._locked():
+                self._reload()
+                self.state["failures"] = 0
+                self._write()
+
+    def record_failure(self, warning: bool = False):
+        """Back off after a failed send; a warning from WhatsApp counts double."""
+        with self._locked():
+            self._reload()
+            self.state["failures"] += 2 if warning else 1
+            backoff = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.state["failures"] - 1))
+            self.state["blocked_until"] = time.time() + backoff
+            self._write()
+        print(f"⚠️ {self.name}: backing off {backoff:.0f}s after {self.state['failures']} failure(s)")
+
+    def status(self) -> Dict:
+        wait = self.wait_time()
+        return {
+            "name": self.name,
+            "tokens": round(self.state["tokens"], 2),
+            "sent_today": self.state["sent_today"],
+            "daily_cap": self.daily_cap,
+            "next_send_in": None if wait is None else round(wait, 1),
+        }
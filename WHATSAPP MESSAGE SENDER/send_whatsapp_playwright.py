@@ -26,16 +26,32 @@ import csv
 import json
 import re
 from datetime import datetime
-from typing import Optional, List, Dict, Tuple, Any
+from urllib.parse import quote
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 
+from contact_index import ContactIndex, normalize_phone
+from message_store import MessageStore
+from rate_scheduler import DAILY_CAP, RateScheduler
+
 # Configuration
-MESSAGES_CSV = "/home/zazikant/whatsapp_messages.csv"
+MESSAGES_CSV = "/home/zazikant/whatsapp_messages.csv"  # export view of MESSAGES_DB
+MESSAGES_DB = "/home/zazikant/whatsapp_messages.db"
 SESSION_DIR = "/home/zazikant/whatsapp_session"
 STATE_FILE = "/home/zazikant/message_state.json"
 
+# Cold start: --keep-alive opens a DevTools port, and later CLI calls attach
+# to that already logged-in browser instead of launching their own
+CDP_PORT = 9222
+CDP_URL = f"http://127.0.0.1:{CDP_PORT}"
+# Keep a full Chromium profile (IndexedDB included) in SESSION_DIR/profile
+# instead of storage_state.json alone; WhatsApp then restores without a resync.
+# The first run with it needs one QR scan.
+PERSISTENT_PROFILE = False
+
 # Contact Cache - Maps phone numbers (last 10 digits) to contact names
 # Update this with your frequent contacts for instant lookups
+# (seeds the persistent contact index, contact_index.CONTACT_INDEX)
 CONTACT_CACHE: Dict[str, str] = {
     "9869101909": "Shashikant Home",
     "8999001625": "Chandrakant Shivadekar GEM",
@@ -48,47 +64,248 @@ CONTACT_CACHE: Dict[str, str] = {
 BATCH_SIZE = 5
 BATCH_DELAY = 120  # seconds between batches
 MESSAGE_DELAY = 3  # seconds between individual messages
+# BATCH_SIZE / BATCH_DELAY / MESSAGE_DELAY set the token bucket of RateScheduler
+# (burst, refill rate, minimum gap); its state lives in rate_scheduler.SCHEDULER_STATE
+
+# Popups WhatsApp shows when a send is refused. An invalid number is not the
+# sender's fault; the rate warnings make the scheduler back off harder.
+INVALID_NUMBER_TEXT = "phone number shared via url is invalid"
+RATE_WARNING_TEXTS = ["try again later", "too many", "unusual activity", "temporarily"]
+
+# "chats" once the chat list renders, "qr" as soon as a login QR code shows
+LOGIN_STATE_JS = """
+() => {
+    if (document.querySelector('[data-testid="chat-list-search"], #pane-side')) return "chats";
+    if (document.querySelector('[data-ref] canvas, canvas[aria-label*="Scan"]')) return "qr";
+    return false;
+}
+"""
+
+# "chat" once a compose box is there, "invalid" as soon as WhatsApp says the
+# number isn't on WhatsApp - so bad numbers fail in ~1s instead of the full timeout
+CHAT_STATE_JS = """
+() => {
+    const compose = document.querySelector(
+        '[data-testid="conversation-compose-box-input"], div[contenteditable="true"][data-tab="10"], ' +
+        'footer div[contenteditable="true"]');
+    if (compose) return "chat";
+    const popup = document.querySelector('div[role="dialog"], [data-animate-modal-popup="true"]');
+    if (popup && popup.innerText.toLowerCase().includes("phone number shared via url is invalid")) return "invalid";
+    return false;
+}
+"""
+
+# Event-driven reply capture (see WhatsAppSender.enable_reply_events).
+# Injected into every WhatsApp Web page; pushes incoming messages to Python
+# through the __waOnIncoming binding instead of Python polling the DOM.
+REPLY_OBSERVER_JS = """
+(() => {
+    if (window.__waReplyObserver || !window.__waOnIncoming) return;
+    const rowState = new Map();   // chat title -> "unread|preview"
+    const seenIds = new Set();    // message data-ids already reported or present
+    let main = null;
+    let settleUntil = 0;
+
+    const text = el => (el && (el.getAttribute('title') || el.innerText) || '').trim();
+    const chatRows = () => document.querySelectorAll('[data-testid="chat-list"] > div > div');
+
+    const rowInfo = row => {
+        const titles = row.querySelectorAll('span[title]');
+        if (!titles.length) return null;
+        const badge = row.querySelector('[aria-label*="unread"], span[class*="unread"], div[class*="unread"]');
+        return {
+            title: text(titles[0]),
+            preview: titles.length > 1 ? text(titles[titles.length - 1]) : '',
+            unread: badge ? parseInt(text(badge), 10) || 1 : 0,
+        };
+    };
+
+    const scanRows = emit => {
+        for (const row of chatRows()) {
+            const info = rowInfo(row);
+            if (!info) continue;
+            const key = info.unread + '|' + info.preview;
+            const before = rowState.get(info.title);
+            rowState.set(info.title, key);
+            // A new incoming message bumps the unread count and the preview
+            // (rows scrolled back into the virtualized list may repeat; Python dedupes by id)
+            if (emit && info.unread > 0 && before !== key) {
+                window.__waOnIncoming({kind: 'chat', contact: info.title, text: info.preview,
+                                       unread: info.unread, id: info.title + '|' + key});
+            }
+        }
+    };
+
+    const messageInfo = node => {
+        const id = node.getAttribute('data-id') || '';
+        const body = node.querySelector('span.selectable-text, span.copyable-text');
+        const meta = node.querySelector('[data-pre-plain-text]');
+        return {
+            id,
+            incoming: id.startsWith('false_') || !!node.closest('.message-in'),
+            phone: (id.split('_')[1] || '').split('@')[0],
+            text: body ? body.innerText.trim() : '',
+            timestamp: meta ? meta.getAttribute('data-pre-plain-text') : '',
+        };
+    };
+
+    const scanConversation = () => {
+        const current = document.querySelector('#main');
+        if (current !== main) {
+            // Newly opened chat: its history renders now and is not news
+            main = current;
+            settleUntil = Date.now() + 2000;
+        }
+        if (!main) return;
+        const nodes = main.querySelectorAll('div[data-id]');
+        const last = nodes[nodes.length - 1];
+        for (const node of nodes) {
+            const id = node.getAttribute('data-id');
+            if (!id || seenIds.has(id)) continue;
+            seenIds.add(id);
+            // Only appended messages count; older history loads above them
+            if (Date.now() < settleUntil || node !== last) continue;
+            const info = messageInfo(node);
+            if (info.incoming && info.text) {
+                window.__waOnIncoming({kind: 'message', contact: text(main.querySelector('header span[title]')),
+                                       phone: info.phone, text: info.text, timestamp: info.timestamp, id: info.id});
+            }
+        }
+    };
+
+    let queued = false;
+    window.__waReplyObserver = new MutationObserver(() => {
+        // Coalesce bursts of mutations into one scan (setTimeout also runs in background tabs)
+        if (queued) return;
+        queued = true;
+        setTimeout(() => { queued = false; scanRows(true); scanConversation(); }, 100);
+    });
+    const start = () => {
+        scanRows(false);
+        scanConversation();
+        window.__waReplyObserver.observe(document.body, {childList: true, subtree: true, characterData: true});
+    };
+    if (document.body) start(); else document.addEventListener('DOMContentLoaded', start);
+})();
+"""
+
+# Bulk extraction of the open chat in one evaluate() round trip
+# (see WhatsAppSender.read_chat). Direction and the replies after our last
+# outgoing message are worked out in the browser.
+READ_CHAT_JS = """
+() => {
+    const SEL = '[data-testid="msg-container"], div[data-id]';
+    // Outermost matches only, so a message is never counted twice
+    const nodes = Array.from(document.querySelectorAll(SEL))
+        .filter(n => !(n.parentElement && n.parentElement.closest(SEL)));
+    const messages = nodes.map((n, i) => {
+        const id = n.getAttribute('data-id') || n.querySelector('[data-id]')?.getAttribute('data-id') || '';
+        const outgoing = id.startsWith('true_') || !!n.closest('.message-out') ||
+            !!n.querySelector('[data-testid="msg-outgoing"], [data-testid="msg-dblcheck"]');
+        const body = n.querySelector('span[class*="selectable-text"], span.copyable-text');
+        const meta = n.querySelector('[data-pre-plain-text]');
+        return {
+            id: id || String(i),
+            direction: outgoing ? 'out' : 'in',
+            text: body ? body.innerText : '',
+            timestamp: meta ? meta.getAttribute('data-pre-plain-text') : '',
+        };
+    });
+    let lastOutgoing = -1;
+    messages.forEach((m, i) => { if (m.direction === 'out') lastOutgoing = i; });
+    const header = document.querySelector('#main header span[title], header span[title]');
+    return {
+        contact: header ? (header.getAttribute('title') || header.innerText) : '',
+        messages,
+        last_outgoing: lastOutgoing,
+        replies: messages.slice(lastOutgoing + 1).filter(m => m.direction === 'in' && m.text).map(m => m.text),
+    };
+}
+"""
 
 
 class WhatsAppSender:
     """Efficient WhatsApp sender with persistent sessions and caching."""
     
-    def __init__(self, headless: bool = False):
+    def __init__(self, headless: bool = False, session_dir: str = SESSION_DIR,
+                 playwright: Optional[Any] = None, browser: Optional[Browser] = None,
+                 persistent: bool = PERSISTENT_PROFILE, serve_cdp: bool = False,
+                 cdp_url: Optional[str] = CDP_URL):
+        """
+        session_dir holds this account's storage_state.json. Pass a running
+        playwright/browser to share them between accounts (see sender_pool.py);
+        they are then left running by stop().
+        
+        Without a shared browser, start() first attaches to a browser kept by
+        --keep-alive at cdp_url (None disables), then falls back to launching:
+        with a persistent profile if `persistent`, and with a DevTools port for
+        later attaches if `serve_cdp`.
+        """
         self.headless = headless
-        self.browser: Optional[Browser] = None
+        self.session_dir = session_dir
+        self.browser: Optional[Browser] = browser
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None  # Will be set in start()
         self.is_logged_in = False
-        self.playwright: Optional[Any] = None
+        self.playwright: Optional[Any] = playwright
+        self._owns_playwright = playwright is None
+        self._owns_browser = browser is None
+        self.persistent = persistent
+        self.serve_cdp = serve_cdp
+        self.cdp_url = cdp_url
+        self.attached = False  # running inside another process's browser
+        self.reply_events = False
+        self.tracked_contacts: Dict[str, str] = {}  # normalized name/phone -> logged contact
+        self.captured_replies: List[Dict] = []
+        self._seen_event_ids: set = set()
+        self.contacts = get_contact_index()
+        # One pacing budget per account (session directory), kept across runs
+        self.scheduler = RateScheduler.from_limits(
+            BATCH_SIZE, BATCH_DELAY, MESSAGE_DELAY, daily_cap=DAILY_CAP, name=Path(session_dir).name
+        )
         
     def _ensure_session_dir(self):
         """Create session directory if it doesn't exist."""
-        Path(SESSION_DIR).mkdir(parents=True, exist_ok=True)
+        Path(self.session_dir).mkdir(parents=True, exist_ok=True)
     
     def start(self) -> bool:
         """Start browser with persistent session storage."""
         self._ensure_session_dir()
         
         try:
-            self.playwright = sync_playwright().start()
+            if self.playwright is None:
+                self.playwright = sync_playwright().start()
             
-            # Launch browser with persistent context
-            self.browser = self.playwright.chromium.launch(
-                headless=self.headless,
-                args=['--disable-blink-features=AutomationControlled']
-            )
-            
-            # Create context with storage state persistence
-            if self.browser is None:
-                raise RuntimeError("Browser failed to launch")
-            storage_state_path = f"{SESSION_DIR}/storage_state.json"
-            initial_storage = storage_state_path if os.path.exists(storage_state_path) else None
-            self.context = self.browser.new_context(
-                storage_state=initial_storage,
-                viewport={'width': 1280, 'height': 800}
-            )
-            
-            self.page = self.context.new_page()
+            if self._owns_browser and self.browser is None and self._attach_cdp():
+                print("⚡ Attached to running browser")
+            elif self._owns_browser and self.browser is None and self.persistent:
+                # Profile directory keeps IndexedDB, so the page restores without a resync
+                self.context = self.playwright.chromium.launch_persistent_context(
+                    f"{self.session_dir}/profile",
+                    headless=self.headless,
+                    args=self._launch_args(),
+                    viewport={'width': 1280, 'height': 800}
+                )
+                self.page = self.context.pages[0] if self.context.pages else self.context.new_page()
+            else:
+                # Launch browser with persistent context
+                if self.browser is None:
+                    self.browser = self.playwright.chromium.launch(
+                        headless=self.headless,
+                        args=self._launch_args()
+                    )
+                
+                # Create context with storage state persistence
+                if self.browser is None:
+                    raise RuntimeError("Browser failed to launch")
+                storage_state_path = f"{self.session_dir}/storage_state.json"
+                initial_storage = storage_state_path if os.path.exists(storage_state_path) else None
+                self.context = self.browser.new_context(
+                    storage_state=initial_storage,
+                    viewport={'width': 1280, 'height': 800}
+                )
+                
+                self.page = self.context.new_page()
             
             # Check if already logged in
             if self._check_login_status():
@@ -98,7 +315,8 @@ class WhatsAppSender:
             
             # Need to login
             print("🔐 Opening WhatsApp Web...")
-            self.page.goto("https://web.whatsapp.com")
+            if not self.page.url.startswith("https://web.whatsapp.com"):
+                self.page.goto("https://web.whatsapp.com")
             
             # Wait for login
             if self._wait_for_login():
@@ -112,16 +330,44 @@ class WhatsAppSender:
             print(f"❌ Error starting browser: {e}")
             return False
     
+    def _launch_args(self) -> List[str]:
+        args = ['--disable-blink-features=AutomationControlled']
+        if self.serve_cdp:
+            args.append(f'--remote-debugging-port={CDP_PORT}')
+        return args
+    
+    def _attach_cdp(self) -> bool:
+        """Reuse the WhatsApp tab of a browser kept by --keep-alive, if one is running."""
+        if not self.cdp_url or self.serve_cdp:
+            return False
+        try:
+            browser = self.playwright.chromium.connect_over_cdp(self.cdp_url, timeout=2000)
+        except Exception:
+            return False
+        for context in browser.contexts:
+            for page in context.pages:
+                if page.url.startswith("https://web.whatsapp.com"):
+                    self.browser, self.context, self.page = browser, context, page
+                    self.attached = True
+                    return True
+        # Browser without a WhatsApp tab - disconnect (the browser keeps running)
+        # and launch our own on a fresh Playwright driver
+        browser.close()
+        if self._owns_playwright:
+            self.playwright.stop()
+            self.playwright = sync_playwright().start()
+        return False
+    
     def _check_login_status(self) -> bool:
-        """Quick check if already logged in."""
+        """Quick check if already logged in - no reload if WhatsApp is already open."""
         page = self.page
         if page is None:
             return False
         try:
-            page.goto("https://web.whatsapp.com")
-            # Try to find chat list quickly
-            page.wait_for_selector('[data-testid="chat-list-search"]', timeout=8000)
-            return True
+            if not page.url.startswith("https://web.whatsapp.com"):
+                page.goto("https://web.whatsapp.com")
+            # Chat list or QR code, whichever shows first
+            return page.wait_for_function(LOGIN_STATE_JS, timeout=8000).json_value() == "chats"
         except:
             return False
     
@@ -145,7 +391,7 @@ class WhatsAppSender:
         if ctx is None:
             return
         try:
-            storage_path = f"{SESSION_DIR}/storage_state.json"
+            storage_path = f"{self.session_dir}/storage_state.json"
             ctx.storage_state(path=storage_path)
             print("💾 Session saved for next time")
         except Exception as e:
@@ -156,9 +402,21 @@ class WhatsAppSender:
         if self.is_logged_in:
             self._save_session()
         
-        if self.browser:
+        # One CSV export per session instead of a rewrite per message
+        export_messages_csv()
+        self.contacts.save()
+        
+        if self.attached:
+            # The --keep-alive process owns this browser; just disconnect
+            pass
+        elif self.context and not self._owns_browser:
+            # Shared browser - close only this account's context
+            self.context.close()
+        elif self.browser and self._owns_browser:
             self.browser.close()
-        if self.playwright:
+        elif self.context and self.persistent:
+            self.context.close()
+        if self.playwright and self._owns_playwright:
             self.playwright.stop()
     
     def __enter__(self):
@@ -169,25 +427,15 @@ class WhatsAppSender:
         self.stop()
     
     def _normalize_phone(self, phone: str) -> str:
-        """Normalize phone number to full international format."""
-        # Remove spaces, dashes, and + prefix for extraction
-        cleaned = re.sub(r'[\s\-+]', '', phone)
-        
-        # If already has country code (more than 10 digits)
-        if len(cleaned) > 10:
-            return f"+{cleaned}"
-        
-        # Default to India (+91) if no country code
-        return f"+91{cleaned}"
+        """Normalize phone number to full international format (cached, defaults to +91)."""
+        return normalize_phone(phone)[0]
     
     def _get_contact_name(self, phone: str, auto_detect: bool = False) -> str:
-        """Get contact name from cache or auto-detect."""
-        cleaned = re.sub(r'[\s\-+]', '', phone)
-        last_10 = cleaned[-10:] if len(cleaned) >= 10 else cleaned
-        
-        # Check cache first
-        if last_10 in CONTACT_CACHE:
-            return CONTACT_CACHE[last_10]
+        """Get contact name from the contact index or auto-detect."""
+        # Check index first
+        name = self.contacts.name(phone)
+        if name:
+            return name
         
         # Auto-detect from chat if requested
         if auto_detect and self.page is not None:
@@ -198,38 +446,51 @@ class WhatsAppSender:
                 if header.count() > 0:
                     name = header.inner_text()
                     if name and len(name) > 0:
-                        # Cache it for next time
-                        CONTACT_CACHE[last_10] = name
+                        # Index it for next time
+                        self.contacts.record(phone, name=name)
                         return name
             except:
                 pass
         
-        # Return formatted phone as fallback
+        # Return formatted phone as fallback - the key earlier message logs used, not the E.164 form
+        cleaned = re.sub(r'[\s\-+]', '', phone)
         return f"+{cleaned}"
     
     def _wait_for_chat_load(self, timeout: int = 15) -> bool:
         """Wait for chat to fully load."""
+        return self._wait_for_chat_state(timeout) == "chat"
+    
+    def _wait_for_chat_state(self, timeout: int = 15) -> Optional[str]:
+        """Wait for the opened chat: "chat", "invalid" (not on WhatsApp) or None on timeout."""
         page = self.page
         if page is None:
-            return False
+            return None
         try:
-            # Multiple selector strategies
-            selectors = [
-                '[data-testid="conversation-compose-box-input"]',
-                'div[contenteditable="true"][data-tab="10"]',
-                'footer div[contenteditable="true"]',
-            ]
-            
-            for selector in selectors:
-                try:
-                    page.wait_for_selector(selector, timeout=timeout * 1000)
-                    return True
-                except:
-                    continue
-            
-            return False
+            # All compose box selectors and the invalid-number popup in one wait
+            return page.wait_for_function(CHAT_STATE_JS, timeout=timeout * 1000).json_value()
         except:
+            return None
+    
+    def _open_chat_checked(self, phone: str, url: str) -> bool:
+        """Open a chat URL, skipping numbers the index knows are not on WhatsApp."""
+        full_phone = self._normalize_phone(phone)
+        if self.contacts.is_invalid(phone):
+            print(f"⏭️ {full_phone} is not on WhatsApp (contact index) - skipped")
+            return False
+        
+        print(f"📱 Opening chat for {full_phone}...")
+        self.page.goto(url)
+        
+        state = self._wait_for_chat_state(timeout=15)
+        if state == "invalid":
+            print(f"❌ {full_phone} is not on WhatsApp")
+            self.contacts.record(phone, status="invalid")
             return False
+        if state != "chat":
+            print(f"❌ Chat did not load for {full_phone}")
+            return False
+        self.contacts.record(phone, status="ok")
+        return True
     
     def _click_send(self) -> bool:
         """Click send button with multiple fallback strategies."""
@@ -269,39 +530,35 @@ class WhatsAppSender:
             print("❌ Not logged in!")
             return False, phone
         
-        full_phone = self._normalize_phone(phone)
-        
         try:
-            # Use URL method - fastest way
-            encoded_msg = message.replace(" ", "%20").replace("\n", "%0A")
-            url = f"https://web.whatsapp.com/send?phone={full_phone}&text={encoded_msg}"
-            
-            print(f"📱 Opening chat for {full_phone}...")
-            page.goto(url)
-            
-            # Wait for chat to load
-            if not self._wait_for_chat_load(timeout=15):
-                print(f"❌ Chat did not load for {full_phone}")
+            # Use URL method - fastest way: open the chat and wait for it to load
+            if not self._open_chat_checked(phone, self._chat_url(phone, message)):
                 return False, phone
-            
-            # Get contact name
-            contact_name = self._get_contact_name(phone, auto_detect=auto_name)
-            
-            # Send message
-            if self._click_send():
-                print(f"✅ Sent to {contact_name}: {message[:50]}...")
-                
-                # Log to CSV
-                log_sent_message(contact_name, message, "text")
-                
-                return True, contact_name
-            else:
-                return False, contact_name
+            return self._send_open_chat(phone, message, auto_name)
                 
         except Exception as e:
             print(f"❌ Error sending to {phone}: {e}")
             return False, phone
     
+    def _chat_url(self, phone: str, message: str = "") -> str:
+        """Chat URL, with the message prefilled if given; every reserved character is escaped."""
+        url = f"https://web.whatsapp.com/send?phone={self._normalize_phone(phone)}"
+        return f"{url}&text={quote(message)}" if message else url
+    
+    def _send_open_chat(self, phone: str, message: str, auto_name: bool = False) -> Tuple[bool, str]:
+        """Send the prefilled message in the chat that is already open."""
+        # Get contact name
+        contact_name = self._get_contact_name(phone, auto_detect=auto_name)
+        
+        # Send message
+        if not self._click_send():
+            return False, contact_name
+        print(f"✅ Sent to {contact_name}: {message[:50]}...")
+        
+        # Log to CSV
+        log_sent_message(contact_name, message, "text")
+        return True, contact_name
+    
     def exit_chat(self) -> bool:
         """
         Exit current chat and go back to chat list.
@@ -378,18 +635,19 @@ class WhatsAppSender:
             print(f"❌ Image not found: {image_path}")
             return False, phone
         
-        full_phone = self._normalize_phone(phone)
-        
         try:
             # Open chat
-            url = f"https://web.whatsapp.com/send?phone={full_phone}"
-            print(f"📱 Opening chat for {full_phone}...")
-            page.goto(url)
-            
-            if not self._wait_for_chat_load(timeout=15):
-                print(f"❌ Chat did not load")
+            if not self._open_chat_checked(phone, self._chat_url(phone)):
                 return False, phone
-            
+            return self._send_image_open_chat(phone, image_path, caption)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            return False, phone
+    
+    def _send_image_open_chat(self, phone: str, image_path: str, caption: str = "") -> Tuple[bool, str]:
+        """Attach and send an image in the chat that is already open."""
+        page = self.page
+        try:
             contact_name = self._get_contact_name(phone, auto_detect=True)
             
             # Click attach button
@@ -508,55 +766,172 @@ class WhatsAppSender:
             self.exit_chat()
         return success, name
     
+    def send_paced(self, phone: str, message: str = "", image_path: str = "", caption: str = "",
+                   idle: Optional[Callable[[float], Any]] = None, auto_name: bool = True,
+                   on_slot: Optional[Callable[[], None]] = None) -> Tuple[str, str]:
+        """
+        Open the chat, then wait for a send slot from self.scheduler, then send
+        the message (or image_path with caption). A slot is only taken for a
+        chat that opened, so bad numbers and missing images cost no quota and
+        no backoff. Waits go to `idle` (default self._idle); if it returns True
+        it left the chat, which is reopened before sending. `on_slot` is called
+        once the slot is taken, right before the send.
+        
+        Returns:
+            (outcome, contact_name) - outcome is "sent", "failed", "invalid"
+            (not on WhatsApp), "error" (image not found) or "deferred" (daily cap)
+        """
+        if image_path and not os.path.exists(image_path):
+            print(f"❌ Image not found: {image_path}")
+            return "error", phone
+        
+        url = self._chat_url(phone, "" if image_path else message)
+        try:
+            opened = self._open_chat_checked(phone, url)
+        except Exception as e:
+            print(f"❌ Error opening chat for {phone}: {e}")
+            opened = False
+        if not opened:
+            if self.contacts.is_invalid(phone):
+                return "invalid", phone
+            self._record_failure(phone)
+            return "failed", phone
+        
+        idle = idle or self._idle
+        left_chat = []
+        if not self.scheduler.acquire(lambda seconds: left_chat.append(idle(seconds))):
+            return "deferred", phone
+        if on_slot is not None:
+            on_slot()
+        
+        try:
+            # Polling for replies during the wait navigates away from the chat
+            if any(left_chat) and not self._open_chat_checked(phone, url):
+                success, contact = False, phone
+            elif image_path:
+                success, contact = self._send_image_open_chat(phone, image_path, caption)
+            else:
+                success, contact = self._send_open_chat(phone, message, auto_name)
+        except Exception as e:
+            print(f"❌ Error sending to {phone}: {e}")
+            success, contact = False, phone
+        
+        if not success:
+            self._record_failure(phone)
+            return "failed", contact
+        self.scheduler.record_success()
+        if self.reply_events:
+            self.track_contacts([contact])
+        return "sent", contact
+    
     def send_batch(self, phones: List[str], message: str) -> Dict:
         """
-        Send messages to multiple contacts with rate limiting.
+        Send messages to multiple contacts, paced by self.scheduler.
         Uses single browser session for efficiency.
-        During batch delay, checks for replies from previous messages.
+        Waits for a send slot are spent capturing replies from previous messages.
+        Contacts left over once the daily cap is reached are returned as "deferred".
         """
-        results = {"success": [], "failed": []}
+        results = {"success": [], "failed": [], "deferred": [], "invalid": []}
+        scheduler = self.scheduler
+        
+        # Known-bad numbers are dropped before any browser work
+        phones, results["invalid"] = self.contacts.preflight(phones)
+        if results["invalid"]:
+            print(f"⏭️ Skipping {len(results['invalid'])} numbers not on WhatsApp: {results['invalid']}")
         
         for i, phone in enumerate(phones):
-            batch_num = (i // BATCH_SIZE) + 1
-            pos_in_batch = (i % BATCH_SIZE) + 1
-            
-            print(f"\n[{batch_num}] {pos_in_batch}/{min(BATCH_SIZE, len(phones) - (batch_num-1)*BATCH_SIZE)}: {phone}")
+            print(f"\n[{i+1}/{len(phones)}] {phone}")
             
             # FIRST: Check for any unread replies before sending new message
-            # This catches replies to previous messages that weren't captured yet
+            # This opens the contact's chat while we wait for the next send slot anyway
             print("  🔍 Checking for pending replies...")
             self._check_and_capture_unread_replies(phone)
             
-            success, name = self.send_message(phone, message, auto_name=True)
-            
-            if success:
+            outcome, name = self.send_paced(phone, message)
+            if outcome == "deferred":
+                print(f"🛑 Daily cap of {scheduler.daily_cap} reached - {len(phones) - i} contacts deferred")
+                results["deferred"] = list(phones[i:])
+                break
+            if outcome == "sent":
                 results["success"].append({"phone": phone, "name": name})
             else:
-                results["failed"].append(phone)
-            
-            # Rate limiting
-            if pos_in_batch < BATCH_SIZE and i < len(phones) - 1:
-                time.sleep(MESSAGE_DELAY)
-            
-            if pos_in_batch == BATCH_SIZE and i < len(phones) - 1:
-                print(f"⏳ Batch {batch_num} complete. Waiting {BATCH_DELAY}s... (checking for replies)")
-                
-                # Check for replies during the wait time
-                self._check_replies_during_delay(BATCH_DELAY - 10)
-                
-                time.sleep(10)  # Small buffer
+                results["invalid" if outcome == "invalid" else "failed"].append(phone)
         
         # Final reply check after all batches
-        print(f"\n🔍 Final reply check...")
-        self._check_replies_during_delay(15)
+        if results["success"]:
+            print(f"\n🔍 Final reply check...")
+            if self.reply_events:
+                self.wait_for_replies(15)
+            else:
+                self._check_replies_during_delay(15)
         
         print(f"\n{'='*60}")
         print(f"✅ Success: {len(results['success'])}/{len(phones)}")
         if results["failed"]:
             print(f"❌ Failed: {results['failed']}")
+        if results["deferred"]:
+            print(f"⏸️ Deferred to tomorrow: {results['deferred']}")
         
         return results
     
+    def _idle(self, seconds: float) -> bool:
+        """Wait for a send slot, capturing replies in the meantime. True if it left the open chat."""
+        if seconds >= 10:
+            print(f"⏳ Next send slot in {seconds:.0f}s... (checking for replies)")
+        if self.reply_events:
+            self.wait_for_replies(seconds)
+        elif seconds >= 10:
+            self._check_replies_during_delay(int(seconds))
+            return True
+        else:
+            time.sleep(seconds)
+        return False
+    
+    def _page_warning(self) -> Optional[str]:
+        """Classify a popup left by a refused send: "invalid", "rate" or None."""
+        page = self.page
+        if page is None:
+            return None
+        try:
+            popup = page.locator('div[role="dialog"], [data-animate-modal-popup="true"]').first
+            if popup.count() == 0:
+                return None
+            text = popup.inner_text(timeout=1000).lower()
+        except:
+            return None
+        if INVALID_NUMBER_TEXT in text:
+            return "invalid"
+        if any(warning in text for warning in RATE_WARNING_TEXTS):
+            return "rate"
+        return None
+    
+    def _record_failure(self, phone: Optional[str] = None):
+        """Tell the scheduler about a failed send; invalid numbers don't slow us down."""
+        if phone and self.contacts.is_invalid(phone):
+            return
+        warning = self._page_warning()
+        if warning == "invalid":
+            print("⚠️ Number is not on WhatsApp")
+            return
+        self.scheduler.record_failure(warning=warning == "rate")
+    
+    def read_chat(self) -> Dict:
+        """
+        Read the open chat in a single page.evaluate() call.
+        
+        Returns:
+            {"contact": str, "messages": [{id, direction, text, timestamp}],
+             "last_outgoing": index or -1, "replies": [incoming texts after it]}
+        """
+        empty = {"contact": "", "messages": [], "last_outgoing": -1, "replies": []}
+        page = self.page
+        if page is None:
+            return empty
+        try:
+            return page.evaluate(READ_CHAT_JS)
+        except Exception:
+            return empty
+    
     def _check_and_capture_unread_replies(self, phone: str) -> List[Dict]:
         """
         Check for unread replies in a specific chat BEFORE sending a new message.
@@ -595,49 +970,14 @@ class WhatsAppSender:
                         break
                 
                 if not has_unread:
-                    # Also check if there are any incoming messages at all
-                    msgs = page.locator('[data-testid="msg-container"], div[data-id]').all()
-                    if msgs:
-                        # Check if any messages are incoming (not from us)
-                        for msg in msgs:
-                            is_outgoing = msg.locator('[data-testid="msg-outgoing"], [data-testid="msg-dblcheck"]').count() > 0
-                            if not is_outgoing:
-                                # Found incoming message - check if we have a sent message before it
-                                break
                     return []
                 
-                # Get contact name
-                try:
-                    header = page.locator('header').first
-                    contact = "Unknown"
-                    if header.locator('span[title]').count() > 0:
-                        contact = header.locator('span[title]').inner_text()
-                except:
-                    contact = phone
-                
-                # Get all messages
-                msgs = page.locator('[data-testid="msg-container"], div[data-id]').all()
-                if not msgs:
+                # Contact and replies after our last message, in one round trip
+                chat = self.read_chat()
+                if not chat["messages"]:
                     return []
-                
-                # Find the last outgoing message
-                last_outgoing_idx = -1
-                for idx, msg in enumerate(msgs):
-                    is_outgoing = msg.locator('[data-testid="msg-outgoing"], [data-testid="msg-dblcheck"]').count() > 0
-                    if is_outgoing:
-                        last_outgoing_idx = idx
-                
-                # Collect all incoming messages after the last outgoing
-                all_replies = []
-                for idx in range(last_outgoing_idx + 1, len(msgs)):
-                    msg = msgs[idx]
-                    is_outgoing = msg.locator('[data-testid="msg-outgoing"], [data-testid="msg-dblcheck"]').count() > 0
-                    if not is_outgoing:
-                        msg_text_el = msg.locator('span[class*="selectable-text"], span.copyable-text').first
-                        if msg_text_el.count() > 0:
-                            reply_text = msg_text_el.inner_text()
-                            if reply_text:
-                                all_replies.append(reply_text)
+                contact = chat["contact"] or "Unknown"
+                all_replies = chat["replies"]
                 
                 if all_replies:
                     combined_reply = " + ".join(all_replies)
@@ -706,32 +1046,11 @@ class WhatsAppSender:
                         row.click()
                         time.sleep(0.8)
                         
-                        # Get all messages
-                        msgs = page.locator('[data-testid="msg-container"], div[data-id]').all()
-                        if not msgs:
+                        # All messages and the replies after our last one, in one round trip
+                        chat = self.read_chat()
+                        if not chat["messages"] or chat["last_outgoing"] == -1:
                             continue
-                        
-                        # Find last outgoing message
-                        last_outgoing_idx = -1
-                        for idx, msg in enumerate(msgs):
-                            is_outgoing = msg.locator('[data-testid="msg-outgoing"], [data-testid="msg-dblcheck"]').count() > 0
-                            if is_outgoing:
-                                last_outgoing_idx = idx
-                        
-                        if last_outgoing_idx == -1:
-                            continue
-                        
-                        # Collect all replies after last outgoing
-                        all_replies = []
-                        for idx in range(last_outgoing_idx + 1, len(msgs)):
-                            msg = msgs[idx]
-                            is_outgoing = msg.locator('[data-testid="msg-outgoing"], [data-testid="msg-dblcheck"]').count() > 0
-                            if not is_outgoing:
-                                msg_text_el = msg.locator('span[class*="selectable-text"], span.copyable-text').first
-                                if msg_text_el.count() > 0:
-                                    reply_text = msg_text_el.inner_text()
-                                    if reply_text:
-                                        all_replies.append(reply_text)
+                        all_replies = chat["replies"]
                         
                         if all_replies:
                             combined_reply = " + ".join(all_replies)
@@ -759,6 +1078,85 @@ class WhatsAppSender:
             print(f"✅ Found {len(new_replies)} replies during batch delay")
         return new_replies
     
+    def _contact_key(self, value: str) -> str:
+        """Match chat titles and logged contacts regardless of spacing ("+91 98201 37483")."""
+        return re.sub(r'[\s\-]', '', value or '').lower()
+    
+    def track_contacts(self, contacts: List[str]):
+        """Contacts whose incoming messages are captured as replies."""
+        for contact in contacts:
+            self.tracked_contacts[self._contact_key(contact)] = contact
+    
+    def enable_reply_events(self, contacts: Optional[List[str]] = None) -> bool:
+        """
+        Switch reply capture to push events.
+        
+        A MutationObserver in WhatsApp Web reports new incoming messages (chat list
+        unread bumps and messages appended to the open chat) through an exposed
+        binding, so no polling, clicking or per-message DOM queries are needed.
+        Events are delivered while Playwright is waiting, e.g. in wait_for_replies().
+        """
+        page = self.page
+        if page is None or self.context is None:
+            return False
+        
+        self.track_contacts(contacts if contacts is not None else get_message_store().contacts())
+        if self.reply_events:
+            return True
+        
+        try:
+            self.context.expose_binding("__waOnIncoming", self._on_incoming_event)
+            # Init script re-installs the observer after every navigation
+            self.context.add_init_script(REPLY_OBSERVER_JS)
+            page.evaluate(REPLY_OBSERVER_JS)
+            self.reply_events = True
+            print(f"👂 Listening for replies from {len(self.tracked_contacts)} contacts")
+            return True
+        except Exception as e:
+            print(f"⚠️ Could not enable reply events: {e}")
+            return False
+    
+    def _on_incoming_event(self, source: Dict, event: Dict):
+        """Binding callback: record a pushed incoming message as a reply."""
+        event_id = event.get("id")
+        if not event_id or event_id in self._seen_event_ids:
+            return
+        self._seen_event_ids.add(event_id)
+        
+        contact = None
+        for candidate in (event.get("contact"), event.get("phone") and f"+{event['phone']}"):
+            if candidate and self._contact_key(candidate) in self.tracked_contacts:
+                contact = self.tracked_contacts[self._contact_key(candidate)]
+                break
+        text = (event.get("text") or "").strip()
+        if contact is None or not text:
+            return
+        
+        if update_reply_for_message(contact, text):
+            print(f"📩 Reply from {contact}: {text[:50]}...")
+            self.captured_replies.append({"contact": contact, "message": text})
+    
+    def wait_for_replies(self, duration: float) -> List[Dict]:
+        """
+        Event-driven replacement for _check_replies_during_delay: waits for
+        `duration` seconds while the page pushes replies. Returns those captured.
+        """
+        page = self.page
+        if page is None:
+            time.sleep(duration)
+            return []
+        
+        start = len(self.captured_replies)
+        try:
+            # Playwright dispatches binding calls only while we are inside one of its calls
+            page.wait_for_timeout(duration * 1000)
+        except Exception as e:
+            print(f"⚠️ Error while waiting for replies: {e}")
+        new_replies = self.captured_replies[start:]
+        if new_replies:
+            print(f"✅ Found {len(new_replies)} replies during batch delay")
+        return new_replies
+    
     def check_replies(self) -> List[Dict]:
         """Check for new replies from contacts."""
         page = self.page
@@ -796,29 +1194,11 @@ class WhatsAppSender:
                     row.click()
                     time.sleep(1)
                     
-                    # Get all messages in the chat
-                    msgs = page.locator('[data-testid="msg-container"], div[data-id]').all()
-                    if not msgs:
+                    # All messages and the replies after our last one, in one round trip
+                    chat = self.read_chat()
+                    if not chat["messages"]:
                         continue
-                    
-                    # Find the last sent message (outgoing) and collect all replies after it
-                    last_outgoing_idx = -1
-                    for i, msg in enumerate(msgs):
-                        is_outgoing = msg.locator('[data-testid="msg-outgoing"], [data-testid="msg-dblcheck"]').count() > 0
-                        if is_outgoing:
-                            last_outgoing_idx = i
-                    
-                    # Collect all incoming messages after the last outgoing
-                    all_replies = []
-                    for i in range(last_outgoing_idx + 1, len(msgs)):
-                        msg = msgs[i]
-                        is_outgoing = msg.locator('[data-testid="msg-outgoing"], [data-testid="msg-dblcheck"]').count() > 0
-                        if not is_outgoing:
-                            msg_text_el = msg.locator('span[class*="selectable-text"], span.copyable-text').first
-                            if msg_text_el.count() > 0:
-                                reply_text = msg_text_el.inner_text()
-                                if reply_text:
-                                    all_replies.append(reply_text)
+                    all_replies = chat["replies"]
                     
                     if all_replies:
                         # Join all replies with +
@@ -846,102 +1226,50 @@ class WhatsAppSender:
             return []
 
 
+_message_store: Optional[MessageStore] = None
+_contact_index: Optional[ContactIndex] = None
+
+
+def get_message_store() -> MessageStore:
+    """Open the message store once per process (imports an existing CSV log on first use)."""
+    global _message_store
+    if _message_store is None:
+        _message_store = MessageStore(MESSAGES_DB, import_csv=MESSAGES_CSV)
+    return _message_store
+
+
+def get_contact_index() -> ContactIndex:
+    """Load the contact index once per process, seeded with CONTACT_CACHE."""
+    global _contact_index
+    if _contact_index is None:
+        _contact_index = ContactIndex(seed=CONTACT_CACHE)
+    return _contact_index
+
+
+def export_messages_csv() -> int:
+    """Refresh MESSAGES_CSV from the message store."""
+    if _message_store is None and not os.path.exists(MESSAGES_DB):
+        return 0
+    return get_message_store().export_csv(MESSAGES_CSV)
+
+
 def log_sent_message(contact: str, message: str, message_type: str = "text"):
     """
-    Log sent message to CSV.
+    Log sent message to the message store.
     Groups messages by day and contact - multiple messages same day are concatenated with +.
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    date_key = timestamp.split(" ")[0]  # YYYY-MM-DD
-    
-    if message_type == "image":
-        display_msg = f"Image: {message}"
-    else:
-        display_msg = message
-    
-    file_exists = os.path.exists(MESSAGES_CSV)
-    
-    if file_exists:
-        # Read existing rows
-        rows = []
-        with open(MESSAGES_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-        
-        # Check if last row is same contact and same day - concatenate with +
-        if rows:
-            last_row = rows[-1]
-            last_date = last_row.get("timestamp", "")[:10]
-            last_contact = last_row.get("contact", "").strip()
-            
-            if last_contact == contact.strip() and last_date == date_key:
-                # Same contact and same day - concatenate messages
-                existing_sent = last_row.get("sent_message", "")
-                new_sent = existing_sent + " + " + display_msg if existing_sent else display_msg
-                rows[-1]["sent_message"] = new_sent
-                rows[-1]["timestamp"] = timestamp  # Update timestamp to latest
-                
-                # Clear the reply since it's now linked to the concatenated message
-                rows[-1]["reply"] = ""
-                
-                with open(MESSAGES_CSV, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=["timestamp", "contact", "sent_message", "reply"])
-                    writer.writeheader()
-                    writer.writerows(rows)
-                return
-    
-    # New row
-    with open(MESSAGES_CSV, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=["timestamp", "contact", "sent_message", "reply"])
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow({
-            "timestamp": timestamp,
-            "contact": contact,
-            "sent_message": display_msg,
-            "reply": ""
-        })
+    display_msg = f"Image: {message}" if message_type == "image" else message
+    get_message_store().log_sent(contact, display_msg)
 
 
 def update_reply_for_message(contact: str, reply_text: str) -> bool:
     """
-    Update reply column in CSV for the most recent message to this contact.
+    Update reply for the most recent message to this contact.
     Multiple replies are concatenated with + until a new message is sent.
     """
-    if not os.path.exists(MESSAGES_CSV):
-        return False
-    
     try:
-        rows = []
-        with open(MESSAGES_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-        
-        # Find last row for this contact with empty reply or concatenate to existing reply
-        updated = False
-        for i in range(len(rows) - 1, -1, -1):
-            row = rows[i]
-            if row.get("contact", "").strip() == contact.strip():
-                current_reply = row.get("reply", "").strip()
-                
-                if not current_reply:
-                    # First reply for this message
-                    rows[i]["reply"] = reply_text
-                    updated = True
-                else:
-                    # Concatenate with + (user sent multiple replies without new message)
-                    rows[i]["reply"] = current_reply + " + " + reply_text
-                    updated = True
-                break
-        
-        if updated:
-            with open(MESSAGES_CSV, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=["timestamp", "contact", "sent_message", "reply"])
-                writer.writeheader()
-                writer.writerows(rows)
-        
-        return updated
-    except:
+        return get_message_store().update_reply(contact, reply_text)
+    except Exception:
         return False
 
 
@@ -974,26 +1302,50 @@ def main():
         print("  python send_whatsapp.py --image PHONE /path/img.jpg 'caption'")
         print("  python send_whatsapp.py --batch 'p1,p2,p3' 'message'")
         print("  python send_whatsapp.py --check-replies")
-        print("  python send_whatsapp.py --keep-alive")
+        print("  python send_whatsapp.py --keep-alive              (later calls attach to this browser)")
+        print("  python send_whatsapp.py PHONE 'message' --profile  (full Chromium profile, no storage_state)")
+        print("  python send_whatsapp.py --watch-replies              (listen for replies until Ctrl+C)")
+        print("  python send_whatsapp.py --batch 'p1,p2' 'message' --watch-replies")
+        print("  python send_whatsapp.py --export-csv")
         print("\nExamples:")
         print('  python send_whatsapp.py "+919869101909" "Hello!"')
         print('  python send_whatsapp.py "9869101909" "Hi" --auto-name')
         print('  python send_whatsapp.py --image "+919869101909" "./photo.jpg" "Check this out"')
         return
     
+    if '--export-csv' in sys.argv:
+        # No browser needed - just refresh the CSV view of the message store
+        print(f"📄 Exported {export_messages_csv()} rows to {MESSAGES_CSV}")
+        return
+    
     # Parse arguments
     keep_alive = '--keep-alive' in sys.argv
     auto_name = '--auto-name' in sys.argv
+    watch_replies = '--watch-replies' in sys.argv
     
     # Remove flags from args
     args = [a for a in args if not a.startswith('--')]
     
-    with WhatsAppSender(headless=False) as sender:
+    # --keep-alive serves its browser to later calls; --profile keeps a full Chromium profile
+    with WhatsAppSender(headless=False, persistent=PERSISTENT_PROFILE or '--profile' in sys.argv,
+                        serve_cdp=keep_alive) as sender:
         if not sender.is_logged_in:
             print("❌ Failed to login")
             return
         
-        if '--batch' in sys.argv:
+        if watch_replies:
+            sender.enable_reply_events()
+        
+        if watch_replies and not args:
+            # Listen only - replies are pushed by the page as they arrive
+            print("\n👂 Watching for replies. Press Ctrl+C to exit.")
+            try:
+                while True:
+                    sender.wait_for_replies(60)
+            except KeyboardInterrupt:
+                print("\n👋 Exiting...")
+            
+        elif '--batch' in sys.argv:
             # Batch mode
             phones = [p.strip() for p in args[0].split(',')]
             message = args[1] if len(args) > 1 else "Hello!"
@@ -1010,6 +1362,10 @@ def main():
             # Check replies
             sender.check_replies()
             
+        elif not args:
+            # --keep-alive on its own: just hold the session for later calls
+            pass
+            
         else:
             # Single message
             phone = args[0]
@@ -1018,10 +1374,13 @@ def main():
         
         # Keep session alive if requested
         if keep_alive:
-            print("\n💾 Session kept alive. Press Ctrl+C to exit.")
+            print(f"\n💾 Session kept alive on {CDP_URL} - other calls attach to it. Press Ctrl+C to exit.")
             try:
                 while True:
-                    time.sleep(1)
+                    if sender.reply_events:
+                        sender.wait_for_replies(1)
+                    else:
+                        time.sleep(1)
             except KeyboardInterrupt:
                 print("\n👋 Exiting...")
 
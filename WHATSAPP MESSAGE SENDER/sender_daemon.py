@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Sender Daemon - one logged-in WhatsApp browser serving send jobs over HTTP
+
+Start it once; scripts and agents then submit jobs without any browser
+startup cost:
+- Jobs: send (text), image, check-replies
+- Each job gets an ID; its status is queued -> running -> done / failed
+  (or deferred at the daily cap, cancelled if cancelled while queued)
+- Higher priority runs first, each account paced by its own RateScheduler:
+  a job waiting for its account's next send slot doesn't hold up the others
+- Replies keep being captured between jobs (--watch-replies)
+
+Playwright's sync API is bound to the thread that started it, so the HTTP
+threads only queue jobs and read their status; all browser work happens in
+the main thread.
+
+Usage:
+  python sender_daemon.py --serve [--accounts sales,support] [--watch-replies]
+  python sender_daemon.py --send PHONE 'message' [--priority 5] [--wait]
+  python sender_daemon.py --image PHONE /path/img.jpg 'caption'
+  python sender_daemon.py --check-replies
+  python sender_daemon.py --status JOB_ID
+
+HTTP:
+  POST /jobs               {"type": "send", "phone": "...", "message": "...", "priority": 0}
+  GET  /jobs/<id>          job status and result
+  POST /jobs/<id>/cancel   cancel a queued job
+  GET  /jobs               all jobs, newest first
+  GET  /health             accounts, rate limits and queue length
+"""
+
+import argparse
+import itertools
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from send_whatsapp_playwright import SESSION_DIR, WhatsAppSender
+from sender_pool import SenderPool, account_for, default_account, load_accounts
+
+SENDER_DAEMON_PORT = 8766
+SENDER_DAEMON_URL = f"http://127.0.0.1:{SENDER_DAEMON_PORT}"
+MAX_FINISHED_JOBS = 1000  # finished jobs kept for status queries
+
+
+class SenderDaemon:
+    """Priority job queue in front of logged-in WhatsAppSenders."""
+
+    JOB_TYPES = ["send", "image", "check-replies"]
+
+    def __init__(self, senders: Dict[str, WhatsAppSender]):
+        self.senders = senders
+        self.jobs: Dict[str, Dict] = {}
+        self.queue: List[Tuple[int, int, str]] = []  # (-priority, sequence, job id)
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = True
+
+    # --- HTTP threads ---
+
+    def submit(self, request: Dict) -> Dict:
+        job_type = request.get("type", "send")
+        if job_type not in self.JOB_TYPES:
+            return {"error": f"Unknown job type {job_type}. Choose from {self.JOB_TYPES}"}
+        # Numbers often arrive as JSON numbers
+        phone = str(request.get("phone") or "").strip()
+        if job_type != "check-replies" and not phone:
+            return {"error": "Missing phone"}
+        if job_type == "send" and not request.get("message"):
+            return {"error": "Missing message"}
+        if job_type == "image" and not request.get("image"):
+            return {"error": "Missing image"}
+        for field in ("message", "image", "caption"):
+            if not isinstance(request.get(field, ""), str):
+                return {"error": f"{field} must be a string"}
+        # Paths resolve on the daemon's machine, so a bad one is caught before it is queued
+        if job_type == "image" and not os.path.exists(request["image"]):
+            return {"error": f"Image not found: {request['image']}"}
+
+        account = request.get("account")
+        if account and account not in self.senders:
+            return {"error": f"Unknown account {account}. Choose from {sorted(self.senders)}"}
+        if not account and phone:
+            account = account_for(phone, list(self.senders))
+
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "type": job_type,
+            "phone": phone,
+            "message": request.get("message", ""),
+            "image": request.get("image", ""),
+            "caption": request.get("caption", ""),
+            "account": account,
+            "priority": int(request.get("priority", 0)),
+            "status": "queued",
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        entry = (-job["priority"], next(self.sequence), job["id"])
+        with self.lock:
+            self.jobs[job["id"]] = job
+            self.queue.append(entry)
+            self.queue.sort()
+            # Place in line: higher-priority jobs queued later still go first
+            position = self.queue.index(entry) + 1
+        self.wakeup.set()
+        return {"id": job["id"], "status": "queued", "queued": position}
+
+    def job(self, job_id: str) -> Dict:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else {"error": f"Unknown job {job_id}"}
+
+    def cancel(self, job_id: str) -> Dict:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return {"error": f"Unknown job {job_id}"}
+            if job["status"] != "queued":
+                return {"error": f"Job {job_id} is {job['status']}"}
+            self.queue = [entry for entry in self.queue if entry[2] != job_id]
+            self._finish(job, "cancelled")
+            return dict(job)
+
+    def list_jobs(self) -> Dict:
+        with self.lock:
+            return {"jobs": [dict(j) for j in reversed(list(self.jobs.values()))]}
+
+    def stats(self) -> Dict:
+        with self.lock:
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            queued = len(self.queue)
+        return {
+            "status": "ok",
+            "queued": queued,
+            "jobs": counts,
+            "accounts": {name: dict(sender.scheduler.status(), logged_in=sender.is_logged_in,
+                                    reply_events=sender.reply_events)
+                         for name, sender in self.senders.items()},
+        }
+
+    # --- main thread ---
+
+    def _next_job(self) -> Tuple[Optional[Dict], float]:
+        """Highest-priority job whose account may send now, else how long until one may."""
+        soonest = 1.0
+        # Scheduler waits read the shared state file, so they are looked up
+        # before taking the job lock that the HTTP threads need
+        with self.lock:
+            accounts = {self.jobs[entry[2]]["account"] for entry in self.queue
+                        if self.jobs[entry[2]]["type"] != "check-replies"}
+        waits = {name: self.senders[name].scheduler.wait_time() for name in accounts}
+        with self.lock:
+            for entry in list(self.queue):
+                job = self.jobs[entry[2]]
+                if job["type"] != "check-replies":
+                    if job["account"] not in waits:
+                        # Queued after the waits were read; picked up next round
+                        soonest = 0.0
+                        continue
+                    wait = waits[job["account"]]
+                    if wait is None:
+                        self.queue.remove(entry)
+                        self._finish(job, "deferred", error="Daily cap reached - submit again tomorrow")
+                        continue
+                    if wait > 0:
+                        soonest = min(soonest, wait)
+                        continue
+                self.queue.remove(entry)
+                job["status"] = "running"
+                job["started"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                return job, 0.0
+        return None, soonest
+
+    def _finish(self, job: Dict, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        job["status"] = status
+        job["finished"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if result is not None:
+            job["result"] = result
+        if error:
+            job["error"] = error
+        # Forget the oldest finished jobs
+        finished = [j["id"] for j in self.jobs.values() if "finished" in j]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def _run(self, job: Dict):
+        print(f"\n▶️ Job {job['id']}: {job['type']} {job['phone']} ({job['account'] or 'all accounts'})")
+        if job["type"] == "check-replies":
+            names = [job["account"]] if job["account"] else list(self.senders)
+            replies = {name: self.senders[name].check_replies() for name in names}
+            with self.lock:
+                self._finish(job, "done", {"replies": replies})
+            return
+
+        sender = self.senders[job["account"]]
+        if sender.contacts.is_invalid(job["phone"]):
+            with self.lock:
+                self._finish(job, "failed", error="Number is not on WhatsApp (contact index)")
+            return
+
+        # The slot is taken only once the chat has opened
+        image = job["image"] if job["type"] == "image" else ""
+        outcome, contact = sender.send_paced(job["phone"], job["message"], image, job["caption"], idle=self._idle)
+        with self.lock:
+            if outcome == "sent":
+                self._finish(job, "done", {"contact": contact})
+            elif outcome == "deferred":
+                self._finish(job, "deferred", error="Daily cap reached - submit again tomorrow")
+            elif outcome == "invalid":
+                self._finish(job, "failed", error="Number is not on WhatsApp")
+            elif outcome == "error":
+                self._finish(job, "failed", error=f"Image not found: {image}")
+            else:
+                self._finish(job, "failed", {"contact": contact}, error="Send failed")
+
+    def _idle(self, seconds: float):
+        """Wait for new jobs or a send slot, capturing replies meanwhile."""
+        listener = next((s for s in self.senders.values() if s.reply_events), None)
+        if listener is not None:
+            listener.wait_for_replies(seconds)
+        else:
+            self.wakeup.wait(seconds)
+        self.wakeup.clear()
+
+    def run_forever(self):
+        while self.running:
+            job, wait = self._next_job()
+            if job is None:
+                self._idle(wait)
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                with self.lock:
+                    self._finish(job, "failed", error=str(e))
+
+
+def serve(host: str = "127.0.0.1", port: int = SENDER_DAEMON_PORT, accounts: Optional[List[Dict]] = None,
+          headless: bool = False, watch_replies: bool = False):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    # One account on SESSION_DIR (sharing the CLI's rate budget), or a pool
+    pool = None
+    if accounts:
+        pool = SenderPool(accounts, headless=headless)
+        pool.start()
+        senders = pool.senders
+    else:
+        sender = WhatsAppSender(headless=headless, session_dir=SESSION_DIR)
+        senders = {"default": sender} if sender.start() and sender.is_logged_in else {}
+    if not senders:
+        print("❌ No logged-in accounts")
+        if pool:
+            pool.stop()
+        else:
+            sender.stop()
+        return
+    if watch_replies:
+        for s in senders.values():
+            s.enable_reply_events()
+
+    daemon = SenderDaemon(senders)
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if parts == ["health"]:
+                result = daemon.stats()
+            elif parts == ["jobs"]:
+                result = daemon.list_jobs()
+            elif len(parts) == 2 and parts[0] == "jobs":
+                result = daemon.job(parts[1])
+            else:
+                result = {"error": f"Unknown path {self.path}"}
+            self.reply(404 if "error" in result else 200, result)
+
+        def do_POST(self):
+            parts = self.path.strip("/").split("/")
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(request, dict):
+                    result = {"error": "Request body must be a JSON object"}
+                elif parts == ["jobs"]:
+                    result = daemon.submit(request)
+                elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+                    result = daemon.cancel(parts[1])
+                else:
+                    result = {"error": f"Unknown path {self.path}"}
+            except (ValueError, TypeError) as e:
+                result = {"error": str(e)}
+            self.reply(400 if "error" in result else 200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🚀 Sender daemon on http://{host}:{port} - accounts: {', '.join(senders)}. Press Ctrl+C to exit.")
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Exiting...")
+    finally:
+        server.shutdown()
+        server.server_close()
+        if pool:
+            pool.stop()
+        else:
+            sender.stop()
+
+
+def call(path: str, payload: Optional[Dict] = None, url: str = SENDER_DAEMON_URL) -> Dict:
+    """Talk to a running daemon: GET without payload, POST with one."""
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url + path, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        return json.load(e)
+    except urllib.error.URLError as e:
+        return {"error": f"Sender daemon not reachable at {url}: {e.reason}"}
+
+
+def submit_job(job: Dict, url: str = SENDER_DAEMON_URL) -> Dict:
+    return call("/jobs", job, url)
+
+
+def wait_for_job(job_id: str, url: str = SENDER_DAEMON_URL, poll: float = 1.0) -> Dict:
+    """Poll until a job has left the queue and finished."""
+    while True:
+        job = call(f"/jobs/{job_id}", url=url)
+        if "error" in job or job.get("status") not in ("queued", "running"):
+            return job
+        time.sleep(poll)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WhatsApp sender daemon and its client.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--serve", action="store_true", help="Run the daemon")
+    group.add_argument("--send", nargs=2, metavar=("PHONE", "MESSAGE"), help="Queue a text message")
+    group.add_argument("--image", nargs="+", metavar="ARG", help="Queue an image: PHONE PATH [CAPTION]")
+    group.add_argument("--check-replies", action="store_true", help="Queue a reply check")
+    group.add_argument("--status", type=str, metavar="JOB_ID", help="Show a job")
+    parser.add_argument("--priority", type=int, default=0, help="Higher runs first")
+    parser.add_argument("--account", type=str, help="Account to use (default: by phone number)")
+    parser.add_argument("--wait", action="store_true", help="Wait for the job to finish")
+    parser.add_argument("--url", type=str, default=SENDER_DAEMON_URL, help="Daemon URL (client)")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Bind address (daemon)")
+    parser.add_argument("--port", type=int, default=SENDER_DAEMON_PORT, help="Port (daemon)")
+    parser.add_argument("--accounts", type=str, help="Comma-separated account names (daemon, see sender_pool.py)")
+    parser.add_argument("--accounts-file", type=str, help="JSON list of accounts (daemon)")
+    parser.add_argument("--watch-replies", action="store_true", help="Capture replies between jobs (daemon)")
+    parser.add_argument("--headless", action="store_true", help="Run Chromium headless (daemon)")
+    args = parser.parse_args()
+
+    if args.serve:
+        accounts = None
+        if args.accounts_file:
+            accounts = load_accounts(args.accounts_file)
+        elif args.accounts:
+            accounts = [default_account(name.strip()) for name in args.accounts.split(",") if name.strip()]
+        serve(args.host, args.port, accounts, args.headless, args.watch_replies)
+        return
+
+    if args.status:
+        result = call(f"/jobs/{args.status}", url=args.url)
+    else:
+        job = {"priority": args.priority, "account": args.account}
+        if args.send:
+            job.update(type="send", phone=args.send[0], message=args.send[1])
+        elif args.image:
+            if len(args.image) < 2:
+                parser.error("--image needs PHONE PATH [CAPTION]")
+            job.update(type="image", phone=args.image[0], image=args.image[1],
+                       caption=args.image[2] if len(args.image) > 2 else "")
+        else:
+            job.update(type="check-replies")
+        result = submit_job(job, args.url)
+        if args.wait and "id" in result:
+            result = wait_for_job(result["id"], args.url)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
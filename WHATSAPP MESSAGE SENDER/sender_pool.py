@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+WhatsApp Sender Pool - several business numbers from one Playwright instance
+
+Each account gets its own browser context and session directory (its own
+storage_state.json) inside one shared Chromium. A contact list is sharded
+across the accounts - a number always goes to the same account, so replies
+land in the chat we sent from - and sends are interleaved: the account whose
+RateScheduler allows a send soonest goes next, so one account's waits are
+spent sending from the others. The sync Playwright API runs on one thread, so
+the contexts take turns; nothing is sent from two accounts at the same instant.
+
+Usage:
+  python sender_pool.py --accounts sales,support --batch "p1,p2,p3" "message"
+  python sender_pool.py --accounts-file accounts.json --batch "p1,p2,p3" "message"
+
+accounts.json:
+  [{"name": "sales", "session_dir": "/home/zazikant/whatsapp_session_sales",
+    "batch_size": 5, "batch_delay": 120, "message_delay": 3, "daily_cap": 200}]
+"""
+
+import argparse
+import json
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List
+
+from playwright.sync_api import sync_playwright
+
+from rate_scheduler import DAILY_CAP, RateScheduler
+from send_whatsapp_playwright import (
+    BATCH_DELAY, BATCH_SIZE, MESSAGE_DELAY, SESSION_DIR, WhatsAppSender, export_messages_csv,
+)
+
+
+def default_account(name: str) -> Dict:
+    """Account with the single-sender rate limits and SESSION_DIR_<name> sessions."""
+    return {
+        "name": name,
+        "session_dir": f"{SESSION_DIR}_{name}",
+        "batch_size": BATCH_SIZE,
+        "batch_delay": BATCH_DELAY,
+        "message_delay": MESSAGE_DELAY,
+        "daily_cap": DAILY_CAP,
+    }
+
+
+def account_for(phone: str, names: List[str]) -> str:
+    """Stable account for a number: crc32 of its last 10 digits."""
+    digits = "".join(c for c in phone if c.isdigit())[-10:]
+    names = sorted(names)
+    return names[zlib.crc32(digits.encode()) % len(names)]
+
+
+def load_accounts(path: str) -> List[Dict]:
+    with open(path, 'r') as f:
+        accounts = json.load(f)
+    return [dict(default_account(a["name"]), **a) for a in accounts]
+
+
+class SenderPool:
+    """Multiple logged-in WhatsAppSenders sharing one browser."""
+
+    def __init__(self, accounts: List[Dict], headless: bool = False):
+        self.accounts = accounts
+        self.headless = headless
+        self.playwright = None
+        self.browser = None
+        self.senders: Dict[str, WhatsAppSender] = {}
+
+    def start(self) -> int:
+        """Log every account in. Returns how many are ready."""
+        self.playwright = sync_playwright().start()
+        self.browser = self.playwright.chromium.launch(
+            headless=self.headless,
+            args=['--disable-blink-features=AutomationControlled']
+        )
+        for account in self.accounts:
+            print(f"\n👤 Account {account['name']}")
+            sender = WhatsAppSender(self.headless, account["session_dir"], self.playwright, self.browser)
+            if sender.start() and sender.is_logged_in:
+                sender.scheduler = RateScheduler.from_limits(
+                    account["batch_size"], account["batch_delay"], account["message_delay"],
+                    daily_cap=account["daily_cap"], name=Path(account["session_dir"]).name,
+                )
+                self.senders[account["name"]] = sender
+            else:
+                print(f"❌ Account {account['name']} failed to login - skipped")
+                sender.stop()
+        return len(self.senders)
+
+    def stop(self):
+        for sender in self.senders.values():
+            sender.stop()
+        if self.browser:
+            self.browser.close()
+        if self.playwright:
+            self.playwright.stop()
+        export_messages_csv()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def shard(self, phones: List[str]) -> Dict[str, List[str]]:
+        """Stable assignment of numbers to the logged-in accounts."""
+        shards: Dict[str, List[str]] = {name: [] for name in sorted(self.senders)}
+        for phone in phones:
+            shards[account_for(phone, list(self.senders))].append(phone)
+        return shards
+
+    def _idle(self, seconds: float):
+        """Wait, letting pushed reply events through if any account listens for them."""
+        if seconds <= 0:
+            return
+        listener = next((s for s in self.senders.values() if s.reply_events), None)
+        if listener is not None:
+            listener.wait_for_replies(seconds)
+        else:
+            time.sleep(seconds)
+
+    def send_batch(self, phones: List[str], message: str, watch_replies: bool = False) -> Dict:
+        """
+        Send to every phone, interleaving accounts by their rate limits (one
+        send at a time). Returns merged results; each entry records the account
+        that sent it.
+        """
+        results = {"success": [], "failed": [], "deferred": [], "invalid": [], "by_account": {}}
+        if not self.senders:
+            print("❌ No logged-in accounts")
+            results["failed"] = list(phones)
+            return results
+
+        if watch_replies:
+            for sender in self.senders.values():
+                sender.enable_reply_events()
+
+        # Known-bad numbers are dropped before sharding (the index is shared by all accounts)
+        phones, results["invalid"] = next(iter(self.senders.values())).contacts.preflight(phones)
+        if results["invalid"]:
+            print(f"⏭️ Skipping {len(results['invalid'])} numbers not on WhatsApp: {results['invalid']}")
+
+        queues = self.shard(phones)
+        for name, queue in queues.items():
+            print(f"📋 {name}: {len(queue)} contacts")
+            results["by_account"][name] = {"success": 0, "failed": 0}
+
+        while any(queues.values()):
+            # The account that may send soonest goes next; accounts at their daily cap drop out
+            waits = {n: self.senders[n].scheduler.wait_time() for n in queues if queues[n]}
+            for n in [n for n, wait in waits.items() if wait is None]:
+                print(f"🛑 {n}: daily cap reached - {len(queues[n])} contacts deferred")
+                results["deferred"].extend({"phone": phone, "account": n} for phone in queues[n])
+                queues[n] = []
+                del waits[n]
+            if not waits:
+                break
+            name = min(waits, key=waits.get)
+            sender = self.senders[name]
+
+            # The chat opens before the account's slot is taken, so a bad number
+            # neither spends its quota nor backs it off
+            phone = queues[name].pop(0)
+            print(f"\n[{name}] {phone}")
+            outcome, contact = sender.send_paced(phone, message, idle=self._idle)
+            if outcome == "deferred":
+                queues[name].insert(0, phone)
+            elif outcome == "sent":
+                results["success"].append({"phone": phone, "name": contact, "account": name})
+                results["by_account"][name]["success"] += 1
+            elif outcome == "invalid":
+                results["invalid"].append(phone)
+            else:
+                results["failed"].append({"phone": phone, "account": name})
+                results["by_account"][name]["failed"] += 1
+
+        if watch_replies:
+            print(f"\n🔍 Final reply check...")
+            self._idle(15)
+
+        print(f"\n{'='*60}")
+        print(f"✅ Success: {len(results['success'])}/{len(phones)}")
+        for name, counts in results["by_account"].items():
+            print(f"   {name}: {counts['success']} sent, {counts['failed']} failed")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send a WhatsApp batch from several accounts at once.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--accounts", type=str, help="Comma-separated account names (sessions in SESSION_DIR_<name>)")
+    group.add_argument("--accounts-file", type=str, help="JSON list of accounts with their own rate limits")
+    parser.add_argument("--batch", type=str, required=True, help="Comma-separated phone numbers")
+    parser.add_argument("message", nargs="?", default="Hello!", help="Message text")
+    parser.add_argument("--watch-replies", action="store_true", help="Capture replies through page events while waiting")
+    parser.add_argument("--headless", action="store_true", help="Run Chromium headless (accounts must already be logged in)")
+    args = parser.parse_args()
+
+    if args.accounts_file:
+        accounts = load_accounts(args.accounts_file)
+    else:
+        accounts = [default_account(name.strip()) for name in args.accounts.split(",") if name.strip()]
+
+    phones = [p.strip() for p in args.batch.split(",") if p.strip()]
+    with SenderPool(accounts, headless=args.headless) as pool:
+        pool.send_batch(phones, args.message, args.watch_replies)
+
+
+if __name__ == "__main__":
+    main()